@@ -0,0 +1,62 @@
+# async_utils.py
+
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable
+
+
+class _Raised:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def as_completed_bounded(
+    items: AsyncIterable[tuple], work: Callable[..., Awaitable], limit: int
+) -> AsyncIterator:
+    """
+    Awaits work(*item) for every item of an async stream, at most `limit` at
+    a time, and yields each result as soon as it is ready (completion order).
+    Items are pulled only as slots free up, so work starts before the stream
+    is exhausted. An exception from `work` or the stream is raised here once
+    the outstanding calls are cancelled; so is closing the generator early.
+    """
+    sem = asyncio.Semaphore(max(1, limit))
+    results: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def run(item):
+        try:
+            res = await work(*item)
+        except Exception as e:
+            res = _Raised(e)
+        finally:
+            sem.release()
+        await results.put(res)
+
+    async def feed():
+        tasks = []
+        try:
+            async for item in items:
+                await sem.acquire()
+                tasks.append(asyncio.create_task(run(item)))
+            await asyncio.gather(*tasks)
+            await results.put(done)
+        except asyncio.CancelledError:
+            for t in tasks:
+                t.cancel()
+            raise
+        except Exception as e:
+            for t in tasks:
+                t.cancel()
+            await results.put(_Raised(e))
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while True:
+            item = await results.get()
+            if item is done:
+                break
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        feeder.cancel()
@@ -0,0 +1,82 @@
+# audio_utils.py
+
+import os
+import re
+import subprocess
+from typing import List, Tuple
+
+# Target length of one transcription segment; cuts snap to the nearest silence
+AUDIO_SEGMENT_SECONDS = float(os.getenv("AUDIO_SEGMENT_SECONDS", "600"))
+# Audio repeated at the start of each segment so words on a cut are not lost
+AUDIO_SEGMENT_OVERLAP = float(os.getenv("AUDIO_SEGMENT_OVERLAP", "2"))
+SILENCE_DB = float(os.getenv("SILENCE_DB", "-35"))
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "0.5"))
+
+# Cuts are searched for in the last part of each segment's window
+SNAP_WINDOW = 0.25
+
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+
+def duration(path: str) -> float:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        capture_output=True,
+        check=True,
+    ).stdout
+    return float(out.strip())
+
+
+def silences(path: str, noise_db: float = SILENCE_DB, min_seconds: float = SILENCE_MIN_SECONDS) -> List[float]:
+    """
+    Midpoints of the silent stretches in the recording, via ffmpeg's
+    silencedetect filter (streams the file, nothing is decoded into memory).
+    """
+    err = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path, "-af",
+         f"silencedetect=noise={noise_db}dB:d={min_seconds}", "-f", "null", "-"],
+        capture_output=True,
+        check=True,
+    ).stderr.decode("utf-8", errors="replace")
+    points, start = [], None
+    for kind, value in _SILENCE_RE.findall(err):
+        if kind == "start":
+            start = max(0.0, float(value))
+        elif start is not None:
+            points.append((start + float(value)) / 2)
+            start = None
+    return points
+
+
+def plan_segments(
+    total: float, cut_points: List[float], target: float = AUDIO_SEGMENT_SECONDS, overlap: float = AUDIO_SEGMENT_OVERLAP
+) -> List[Tuple[float, float, float]]:
+    """
+    Splits 0..total into (start, boundary, end) segments of about `target`
+    seconds. Each cut is the silence closest to the target length (a hard cut
+    if there is none near it) and every segment after the first starts
+    `overlap` seconds before its boundary, the point where the previous
+    segment ended.
+    """
+    segments, boundary = [], 0.0
+    while total - boundary > target * (1 + SNAP_WINDOW):
+        ideal = boundary + target
+        near = [p for p in cut_points if ideal - target * SNAP_WINDOW <= p <= ideal + target * SNAP_WINDOW]
+        cut = min(near, key=lambda p: abs(p - ideal)) if near else ideal
+        segments.append((max(0.0, boundary - overlap), boundary, cut))
+        boundary = cut
+    segments.append((max(0.0, boundary - overlap), boundary, total))
+    return segments
+
+
+def extract_segment(path: str, start: float, end: float) -> bytes:
+    """
+    One segment re-encoded as 16 kHz mono FLAC, which is what Whisper
+    resamples to anyway, so uploads stay small.
+    """
+    return subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+         "-i", path, "-ac", "1", "-ar", "16000", "-c:a", "flac", "-f", "flac", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout
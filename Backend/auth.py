@@ -17,6 +17,7 @@ import gridfs
 
 from models import User, UserUpdate, Token, LoginResponse
 from config import CONNECTION_STRING, SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from uploads import MAX_AVATAR_BYTES, max_body, spooled
 
 load_dotenv()
 
@@ -86,16 +87,19 @@ async def save_avatar_file_to_gridfs(file: UploadFile) -> str:
             status_code=400,
             detail="Invalid image format. Only JPEG, PNG, and GIF are accepted."
         )
-    try:
-        contents = await file.read()
-        file_id = fs.put(contents, filename=file.filename, contentType=file.content_type)
-        logger.info(f"Avatar stored in GridFS with file_id: {file_id}")
-        return str(file_id)
-    except Exception as e:
-        logger.exception("Failed to store avatar in GridFS")
-        raise HTTPException(status_code=500, detail="Could not store avatar file in MongoDB.")
+    async with spooled(file, MAX_AVATAR_BYTES) as path:
+        try:
+            # GridFS reads the spooled file chunk by chunk
+            with open(path, "rb") as f:
+                file_id = fs.put(f, filename=file.filename, contentType=file.content_type)
+            logger.info(f"Avatar stored in GridFS with file_id: {file_id}")
+            return str(file_id)
+        except Exception as e:
+            logger.exception("Failed to store avatar in GridFS")
+            raise HTTPException(status_code=500, detail="Could not store avatar file in MongoDB.")
 
 @router.post("/signup", response_model=Token)
+@max_body(MAX_AVATAR_BYTES)
 async def signup(
     request: Request,
     name: str = Form(...),
@@ -160,6 +164,7 @@ async def get_user_data(request: Request, current_user: dict = Depends(get_curre
     }
 
 @router.put("/user/update")
+@max_body(MAX_AVATAR_BYTES)
 async def update_user(
     request: Request,
     name: Optional[str] = Form(None),
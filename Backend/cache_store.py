@@ -0,0 +1,90 @@
+# cache_store.py
+
+import hashlib
+import threading
+from datetime import datetime
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure
+
+from config import CONNECTION_STRING
+from uploads import mapped
+
+_client = MongoClient(CONNECTION_STRING)
+_db = _client["edulearnai"]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    # hashes through a memory map so large uploads are never copied into memory
+    with mapped(path) as view:
+        return content_hash(view)
+
+
+class MongoCache:
+    """
+    Persistent key/value cache backed by a MongoDB collection.
+    Entries expire `ttl_seconds` after their last use (Mongo TTL index) and the
+    least recently used ones are evicted once `max_entries` is exceeded.
+    Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.collection = _db[f"cache_{name}"]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            self.collection.create_index("last_used", expireAfterSeconds=ttl_seconds)
+        except OperationFailure:
+            # TTL changed since the index was created
+            _db.command("collMod", self.collection.name, index={"keyPattern": {"last_used": 1}, "expireAfterSeconds": ttl_seconds})
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str):
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            {"$set": {"last_used": datetime.utcnow()}, "$inc": {"uses": 1}},
+        )
+        self._count(doc is not None)
+        return doc["value"] if doc else None
+
+    def set(self, key: str, value, **fields):
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {"_id": key},
+            {"value": value, "created_at": now, "last_used": now, "uses": 0, **fields},
+            upsert=True,
+        )
+        self._evict()
+
+    def delete(self, key: str):
+        self.collection.delete_one({"_id": key})
+
+    def _evict(self):
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        stale = self.collection.find({}, {"_id": 1}).sort("last_used", ASCENDING).limit(excess)
+        self.collection.delete_many({"_id": {"$in": [d["_id"] for d in stale]}})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cache": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.collection.estimated_document_count(),
+            "max_entries": self.max_entries,
+        }
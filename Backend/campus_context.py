@@ -0,0 +1,162 @@
+# campus_context.py
+
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+from langchain_community.vectorstores import FAISS
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from cache_store import content_hash
+import model_registry
+from semantic_cache import entity_terms
+
+logger = logging.getLogger("uvicorn")
+
+# Scraped campus site the assistant answers from; re-indexed when it changes
+CAMPUS_CONTEXT_PATH = os.getenv("CAMPUS_CONTEXT_PATH", "output.txt")
+# Passages put into each prompt
+CAMPUS_CONTEXT_TOP_K = int(os.getenv("CAMPUS_CONTEXT_TOP_K", "4"))
+CAMPUS_CHUNK_SIZE = int(os.getenv("CAMPUS_CHUNK_SIZE", "800"))
+CAMPUS_CHUNK_OVERLAP = 100
+
+# Rough characters per token of English prose for the Llama tokenizer
+CHARS_PER_TOKEN = 4
+
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_EMPHASIS = re.compile(r"(\*\*|__)")
+_SLIDER = re.compile(r"wowslider|javascript slider", re.I)
+# lines with nothing left but bullets and punctuation (empty list items, rules)
+_NOISE = re.compile(r"^[\W_]*$")
+
+
+def _is_counter(line: str) -> bool:
+    # slider and pager numbering ("1 2 3 ... 10"); phone numbers, dates and
+    # amounts have separators or do not count up from 1
+    tokens = line.split()
+    return len(tokens) > 1 and tokens == [str(i) for i in range(1, len(tokens) + 1)]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def clean(raw: str) -> str:
+    """
+    Reduces the scraped markdown to its prose: images and slider markup are
+    dropped, links keep only their text, and lines repeated across the
+    scrape (menus, footers) are kept once; headings always stay.
+    """
+    seen = set()
+    lines = []
+    for line in raw.splitlines():
+        if _SLIDER.search(line):
+            continue
+        line = _IMAGE.sub("", line)
+        line = _LINK.sub(r"\1", line)
+        line = " ".join(_EMPHASIS.sub("", line).split())
+        if _NOISE.match(line) or _is_counter(line):
+            if lines and lines[-1]:
+                lines.append("")  # keep paragraph breaks for the splitter
+            continue
+        if line in seen and not line.startswith("#"):
+            continue
+        seen.add(line)
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+class CampusContext:
+    """
+    Retrieval index over the cleaned campus scrape, so a question carries
+    its top-k passages instead of the whole file. The file's mtime and size
+    are checked on every lookup and the index rebuilt when they change;
+    rebuilds are cheap because chunk vectors come from the embedding cache.
+    """
+
+    def __init__(self, path: str = CAMPUS_CONTEXT_PATH, top_k: int = CAMPUS_CONTEXT_TOP_K):
+        self.path = path
+        self.top_k = top_k
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=CAMPUS_CHUNK_SIZE, chunk_overlap=CAMPUS_CHUNK_OVERLAP)
+        self.version = None  # (mtime, size) of the indexed file
+        self.fingerprint = ""  # sha256 of the indexed file's contents
+        self.entities = frozenset()  # names in the file, for semantic cache hits
+        self.store: Optional[FAISS] = None
+        self.chunks = 0
+        self.full_tokens = 0
+        self.requests = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime, st.st_size)
+
+    def refresh(self) -> bool:
+        """
+        Re-indexes the file if it changed since the last build; True if it did.
+        """
+        if self._current() == self.version and self.version is not None:
+            return False
+        with self._lock:
+            version = self._current()
+            if version == self.version and version is not None:
+                return False  # another thread rebuilt it meanwhile
+            start = time.perf_counter()
+            raw = ""
+            if version is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+            text = clean(raw)
+            chunks = self.splitter.split_text(text)
+            self.store = FAISS.from_texts(chunks, model_registry.embeddings()) if chunks else None
+            self.chunks = len(chunks)
+            self.full_tokens = estimate_tokens(raw)
+            self.fingerprint = content_hash(raw.encode("utf-8"))
+            self.entities = entity_terms(text)
+            self.version = version
+            logger.info(f"Indexed {self.path}: {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+            return True
+
+    async def retrieve(self, query: str, vector: Optional[List[float]] = None) -> List[str]:
+        # pass the query's embedding when the caller already has it
+        await asyncio.to_thread(self.refresh)
+        if self.store is None:
+            return []
+        if vector is None:
+            docs = await self.store.asimilarity_search(query, k=self.top_k)
+        else:
+            docs = await self.store.asimilarity_search_by_vector(vector, k=self.top_k)
+        return [d.page_content for d in docs]
+
+    def record(self, context: str) -> dict:
+        # savings are against the previous prompt, which carried the raw file
+        sent = estimate_tokens(context)
+        saved = max(0, self.full_tokens - sent)
+        self.requests += 1
+        self.tokens_sent += sent
+        self.tokens_saved += saved
+        return {"context_tokens": sent, "full_context_tokens": self.full_tokens, "tokens_saved": saved}
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "fingerprint": self.fingerprint,
+            "chunks": self.chunks,
+            "top_k": self.top_k,
+            "full_context_tokens": self.full_tokens,
+            "requests": self.requests,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+campus_context = CampusContext()
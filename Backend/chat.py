@@ -3,6 +3,7 @@ import uuid
 from fastapi import APIRouter, HTTPException, Path
 from fastapi.responses import StreamingResponse
 from langchain_groq import ChatGroq
+import model_registry
 from langchain.prompts import ChatPromptTemplate
 from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
 
@@ -15,12 +16,7 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 def get_llm() -> ChatGroq:
     if not config.CHATGROQ_API_KEY:
         raise RuntimeError("CHATGROQ_API_KEY not set in environment")
-    return ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0,
-        max_tokens=1024,
-        api_key=config.CHATGROQ_API_KEY
-    )
+    return model_registry.chat_groq(config.CHATGROQ_API_KEY)
 
 llm = get_llm()
 
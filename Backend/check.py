@@ -1,15 +1,27 @@
 # check.py
 
 import os
-import tempfile
+import asyncio
 import json
-import numpy as np
-import cv2
+from contextlib import AsyncExitStack
+from typing import List, Optional
 from PIL import Image
-from pdf2image import convert_from_bytes
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, StreamingResponse
-from google import genai
+
+from pdf_utils import aiter_pages, render_page
+from async_utils import as_completed_bounded
+from cache_store import MongoCache, file_hash
+import ocr_cache
+import grading_jobs
+from grading_jobs import normalize_paper
+import grading_engine
+import model_registry
+from image_prep import to_part
+from page_prep import GRADING_MODE, prepare_page
+from rate_limiter import gemini_generate
+from uploads import MAX_PDF_BYTES, discard, max_body, spool, spooled
 
 router = APIRouter(prefix="/check", tags=["check"])
 
@@ -17,11 +29,17 @@ router = APIRouter(prefix="/check", tags=["check"])
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 if not GENAI_API_KEY:
     raise Exception("GENAI_API_KEY not set in environment")
-client = genai.Client(api_key=GENAI_API_KEY)
+client = model_registry.genai_client(GENAI_API_KEY)
+
+# Max pages graded at the same time (each page makes two Gemini calls)
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "8"))
 
-# Temp storage for results
-TEMP_FOLDER = tempfile.gettempdir()
-RESULT_FILE = os.path.join(TEMP_FOLDER, "result_cards.json")
+# Parsed answer keys, keyed by a hash of the key PDF
+answer_key_cache = MongoCache(
+    "answer_keys",
+    ttl_seconds=int(os.getenv("ANSWER_KEY_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("ANSWER_KEY_CACHE_SIZE", "500")),
+)
 
 
 def extract_json_from_output(output_str: str):
@@ -35,7 +53,14 @@ def extract_json_from_output(output_str: str):
         return None
 
 
-def parse_all_answers(image_input: Image.Image) -> str:
+def image_part(image_input):
+    # PIL images are shrunk before upload; prepared parts (see prepare_page) pass through
+    if isinstance(image_input, Image.Image):
+        return to_part(image_input)[0]
+    return image_input
+
+
+async def parse_all_answers(image_input: Image.Image) -> str:
     output_format = """
 Answer in the following JSON format. Do not write anything else:
 { "Answers": { "1": "<…>", …, "15": "<…>" } }
@@ -45,13 +70,13 @@ You are an assistant that extracts answers from an image of a 15-question sheet.
 Provide ONLY JSON in this format:
 {output_format}
 """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=[prompt, image_input]
+    response = await gemini_generate(
+        client, model="gemini-2.0-flash", contents=[prompt, image_part(image_input)]
     )
     return response.text
 
 
-def parse_info(image_input: Image.Image) -> str:
+async def parse_info(image_input: Image.Image) -> str:
     output_format = """
 Answer in the following JSON format. Do not write anything else:
 { "Candidate Info": { "Name": "<…>", "Number": "<…>", "Country": "<…>", "Level": "<…>", "Paper": "<…>" } }
@@ -61,93 +86,344 @@ You are an assistant that extracts candidate info from an image.
 Provide ONLY JSON in this format:
 {output_format}
 """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=[prompt, image_input]
+    response = await gemini_generate(
+        client, model="gemini-2.0-flash", contents=[prompt, image_part(image_input)]
     )
     return response.text
 
 
-def calculate_result(student_answers: dict, correct_answers: dict) -> dict:
-    student_all = (student_answers or {}).get("Answers", {})
-    correct_all = (correct_answers or {}).get("Answers", {})
-    total = 15
-    marks = 0
-    detailed = {}
-    for q in map(str, range(1, total + 1)):
-        stud = (student_all.get(q) or "").strip()
-        corr = (correct_all.get(q) or "").strip()
-        ok = stud == corr
-        detailed[q] = {"Student": stud, "Correct": corr, "Result": "Correct" if ok else "Incorrect"}
-        if ok:
-            marks += 1
-    return {"Total Marks": marks, "Total Questions": total, "Percentage": marks / total * 100, "Detailed Results": detailed}
+PAYLOAD_KEYS = ("raw_bytes", "sent_bytes", "saved_bytes")
+
+
+def payload_totals(results: list) -> dict:
+    # image bytes sent to the model across graded pages (see image_prep)
+    totals = dict.fromkeys(PAYLOAD_KEYS, 0)
+    for r in results:
+        for k in PAYLOAD_KEYS:
+            totals[k] += r.get("Image Payload", {}).get(k, 0)
+    return totals
+
+
+def calculate_result(student_answers: dict, correct_answers: dict, num_questions: Optional[int] = None) -> dict:
+    if num_questions is None:
+        num_questions = grading_engine.question_count(correct_answers)
+    scored = grading_engine.score_batch([student_answers], correct_answers, num_questions)
+    return grading_engine.student_result(scored, 0)
+
+
+def batch_analytics(results: list, answer_keys: dict) -> dict:
+    """
+    Item analysis per answer key over every successfully graded page.
+    Pages routed to a key not in answer_keys (e.g. results resumed from an
+    earlier run with other keys) are left out.
+    """
+    by_paper = {}
+    for r in results:
+        if "Error" not in r:
+            by_paper.setdefault(r.get("Paper Key", "*"), []).append(r["Student Answers"])
+    analytics = {}
+    for paper, answers in by_paper.items():
+        key = answer_keys.get(paper)
+        if key is None:
+            continue
+        scored = grading_engine.score_batch(answers, key, grading_engine.question_count(key))
+        analytics[paper] = grading_engine.item_analysis(scored)
+    return analytics
+
+
+async def load_answer_key(pdf: str) -> dict:
+    key = await asyncio.to_thread(file_hash, pdf)
+    cached = await asyncio.to_thread(answer_key_cache.get, key)
+    if cached is not None:
+        return cached
+
+    last_page = await asyncio.to_thread(lambda: image_part(render_page(pdf, -1)))
+    resp = await parse_all_answers(last_page)
+    answer_key = extract_json_from_output(resp)
+    if answer_key is not None:
+        await asyncio.to_thread(answer_key_cache.set, key, answer_key)
+    return answer_key
+
+
+def select_answer_key(candidate_info: dict, answer_keys: dict) -> tuple:
+    """
+    Picks the key for a candidate's paper. answer_keys maps paper codes to
+    parsed keys; a "*" entry is used for any paper without its own key.
+    """
+    code = normalize_paper(candidate_info.get("Paper"))
+    if code in answer_keys:
+        return code, answer_keys[code]
+    if "*" in answer_keys:
+        return "*", answer_keys["*"]
+    raise ValueError(f"No answer key for paper '{candidate_info.get('Paper')}'.")
+
+
+def parses(text: str) -> bool:
+    # only model output that yields JSON is worth caching
+    return extract_json_from_output(text) is not None
+
+
+async def grade_prepared_page(idx: int, prepared: Optional[dict], answer_keys: dict) -> Optional[dict]:
+    if prepared is None:
+        return None
+
+    # parse candidate info
+    info_txt, info_hit = await ocr_cache.cached(
+        "grade_info", prepared["fp"]["info"], parse_info, prepared["info"], accept=parses
+    )
+    sent = [] if info_hit else ["info"]
+    candidate_info = extract_json_from_output(info_txt) or {}
+    paper, answer_key = select_answer_key(candidate_info.get("Candidate Info") or {}, answer_keys)
+
+    # parse student answers (locally read sheets skip the model)
+    if prepared["omr"] is not None:
+        stud_answers, source = prepared["omr"], "omr"
+    else:
+        answers_txt, hit = await ocr_cache.cached(
+            "grade_answers", prepared["fp"]["answers"], parse_all_answers, prepared["answers"], accept=parses
+        )
+        stud_answers, source = extract_json_from_output(answers_txt), "llm_cache" if hit else "llm"
+        if not hit:
+            sent.append("answers")
+    if stud_answers is None:
+        raise ValueError(f"Failed to parse answers on page {idx}.")
+
+    # grade
+    result = calculate_result(stud_answers, answer_key)
+
+    graded = {
+        "Student Index": idx,
+        "Candidate Info": candidate_info.get("Candidate Info", {}),
+        "Student Answers": stud_answers,
+        "Answer Source": source,
+        "Result": result,
+        # only images actually uploaded count; cache hits sent nothing
+        "Image Payload": {k: sum(prepared["stats"][part][k] for part in sent) for k in PAYLOAD_KEYS},
+    }
+    if paper != "*":
+        graded["Paper Key"] = paper
+    return graded
+
+
+async def grade_page(idx: int, page: Image.Image, answer_keys: dict, mode: str = GRADING_MODE) -> Optional[dict]:
+    prepared = await asyncio.to_thread(prepare_page, page, mode)
+    return await grade_prepared_page(idx, prepared, answer_keys)
+
+
+async def iter_graded_pages(
+    pages, answer_keys: dict, concurrency: int = GRADING_CONCURRENCY, mode: str = GRADING_MODE
+):
+    """
+    Grades (page_number, image) pairs from an async page stream against
+    answer_keys (see select_answer_key), at most `concurrency` pages at a
+    time, and yields each result as soon as it is ready. Image work runs in
+    worker threads and model calls go through the shared Gemini limiter.
+    Pages are pulled only as workers free up, so grading starts before the
+    whole PDF is decoded. A page that fails is yielded with an "Error" entry
+    instead of aborting the batch.
+    """
+    async def worker(idx, page):
+        try:
+            return await grade_page(idx, page, answer_keys, mode)
+        except Exception as e:
+            return {"Student Index": idx, "Error": str(e)}
+
+    graded = as_completed_bounded(pages, worker, concurrency)
+    try:
+        async for res in graded:
+            if res is not None:
+                yield res
+    finally:
+        await graded.aclose()  # stops outstanding pages now if the caller stops early
+
+
+def attach_answer_key(results: list, answer_keys: dict) -> list:
+    return [
+        {**r, "Correct Answer Key": answer_keys.get(r.get("Paper Key", "*"))} if "Error" not in r else r
+        for r in results
+    ]
 
 
-def load_answer_key(pdf_bytes: bytes) -> dict:
-    images = convert_from_bytes(pdf_bytes)
-    last_page = images[-1]
-    resp = parse_all_answers(last_page)
-    return extract_json_from_output(resp)
+def job_answer_keys(job: dict) -> dict:
+    return job.get("answer_keys") or {"*": job.get("answer_key")}
+
+
+async def run_grading_job(job_id: str, pages, answer_keys: dict, concurrency: int, mode: str):
+    """
+    Wraps iter_graded_pages for a job: every result is stored as soon as it is
+    yielded and the job is marked completed (with its item analysis) or
+    failed at the end.
+    """
+    results = []
+    try:
+        async for res in iter_graded_pages(pages, answer_keys, concurrency, mode):
+            await asyncio.to_thread(grading_jobs.save_result, job_id, res)
+            results.append(res)
+            yield res
+    except (asyncio.CancelledError, GeneratorExit):
+        await asyncio.to_thread(grading_jobs.finish_job, job_id, "cancelled")
+        raise
+    except Exception as e:
+        await asyncio.to_thread(grading_jobs.finish_job, job_id, "failed", error=str(e))
+        raise
+    analytics = await asyncio.to_thread(batch_analytics, results, answer_keys)
+    await asyncio.to_thread(grading_jobs.finish_job, job_id, analytics=analytics)
 
 
 @router.post("/process", summary="Grade student sheets (Paper K only)")
+@max_body(MAX_PDF_BYTES, MAX_PDF_BYTES)
 async def process_pdfs(
     student_pdf: UploadFile = File(..., description="Student sheets PDF"),
     paper_k_pdf: UploadFile = File(..., description="Answer key PDF for Paper K"),
+    concurrency: int = Query(GRADING_CONCURRENCY, ge=1, le=32, description="Pages graded in parallel"),
+    mode: str = Query(GRADING_MODE, pattern="^(llm|omr)$", description="Answer reading: llm or local omr"),
 ):
     try:
-        stud_bytes = await student_pdf.read()
-        key_bytes = await paper_k_pdf.read()
+        async with spooled(student_pdf, MAX_PDF_BYTES) as stud_path, spooled(paper_k_pdf, MAX_PDF_BYTES) as key_path:
+            answer_key = await load_answer_key(key_path)
+            if answer_key is None:
+                raise HTTPException(400, detail="Could not parse Paper K answer key.")
+
+            job_id = await asyncio.to_thread(grading_jobs.create_job, answer_key, mode=mode)
+            answer_keys = {"*": answer_key}
+            graded = [r async for r in run_grading_job(job_id, aiter_pages(stud_path), answer_keys, concurrency, mode)]
+        graded.sort(key=lambda r: r["Student Index"])
+        all_results = attach_answer_key(graded, answer_keys)
+        job = await asyncio.to_thread(grading_jobs.get_job, job_id)
+
+        return JSONResponse(
+            content={
+                "job_id": job_id,
+                "results": all_results,
+                "analytics": job.get("analytics"),
+                "image_payload": payload_totals(graded),
+            }
+        )
 
-        answer_key = load_answer_key(key_bytes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+def format_record(kind: str, payload: dict, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": kind, **payload}) + "\n"
+
+
+@router.post("/process/stream", summary="Grade student sheets and stream each result as it finishes")
+@max_body(MAX_PDF_BYTES, MAX_PDF_BYTES)
+async def process_pdfs_stream(
+    student_pdf: UploadFile = File(..., description="Student sheets PDF"),
+    paper_k_pdf: UploadFile = File(..., description="Answer key PDF for Paper K"),
+    concurrency: int = Query(GRADING_CONCURRENCY, ge=1, le=32, description="Pages graded in parallel"),
+    mode: str = Query(GRADING_MODE, pattern="^(llm|omr)$", description="Answer reading: llm or local omr"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse (server-sent events)"),
+):
+    """
+    Emits an "answer_key" record (with the job_id) first, then one "result"
+    record per page in completion order (use "Student Index" to re-order),
+    then a "summary" record.
+    """
+    # the student PDF outlives this handler: the stream removes it when done
+    stud_path = await spool(student_pdf, MAX_PDF_BYTES)
+    try:
+        async with spooled(paper_k_pdf, MAX_PDF_BYTES) as key_path:
+            answer_key = await load_answer_key(key_path)
         if answer_key is None:
             raise HTTPException(400, detail="Could not parse Paper K answer key.")
 
-        student_pages = convert_from_bytes(stud_bytes)
-        all_results = []
-
-        for idx, page in enumerate(student_pages, start=1):
-            # crop candidate-info
-            cv = cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR)
-            h, w = cv.shape[:2]
-            mask = np.zeros((h, w), dtype="uint8")
-            top, bottom = int(h * 0.10), int(h * 0.75)
-            cv2.rectangle(mask, (0, top), (w, h - bottom), 255, -1)
-            crop = cv2.bitwise_and(cv, cv, mask=mask)
-            coords = cv2.findNonZero(mask)
-            if coords is None:
-                continue
-            x, y, mw, mh = cv2.boundingRect(coords)
-            cand_img = Image.fromarray(cv2.cvtColor(crop[y : y + mh, x : x + mw], cv2.COLOR_BGR2RGB))
-
-            # parse candidate info
-            info_txt = parse_info(cand_img)
-            candidate_info = extract_json_from_output(info_txt) or {}
-
-            # parse student answers
-            stud_txt = parse_all_answers(page)
-            stud_answers = extract_json_from_output(stud_txt)
-            if stud_answers is None:
-                raise HTTPException(400, detail=f"Failed to parse answers on page {idx}.")
-
-            # grade
-            result = calculate_result(stud_answers, answer_key)
-
-            all_results.append(
-                {
-                    "Student Index": idx,
-                    "Candidate Info": candidate_info.get("Candidate Info", {}),
-                    "Student Answers": stud_answers,
-                    "Correct Answer Key": answer_key,
-                    "Result": result,
-                }
-            )
-
-        # write file
-        with open(RESULT_FILE, "w", encoding="utf-8") as f:
-            json.dump({"results": all_results}, f, indent=2)
-
-        return JSONResponse(content={"results": all_results})
+        job_id = await asyncio.to_thread(grading_jobs.create_job, answer_key, mode=mode)
+    except BaseException:
+        discard(stud_path)
+        raise
+
+    async def stream():
+        yield format_record("answer_key", {"job_id": job_id, "Correct Answer Key": answer_key}, format)
+        graded = failed = 0
+        results = []
+        try:
+            async for res in run_grading_job(job_id, aiter_pages(stud_path), {"*": answer_key}, concurrency, mode):
+                if "Error" in res:
+                    failed += 1
+                else:
+                    graded += 1
+                    results.append(res)
+                yield format_record("result", res, format)
+        except Exception as e:
+            yield format_record("error", {"detail": str(e)}, format)
+            return
+        finally:
+            discard(stud_path)
+
+        job = await asyncio.to_thread(grading_jobs.get_job, job_id)
+        yield format_record(
+            "summary",
+            {
+                "job_id": job_id,
+                "graded": graded,
+                "failed": failed,
+                "analytics": job.get("analytics"),
+                "image_payload": payload_totals(results),
+            },
+            format,
+        )
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+@router.post("/process_multi", summary="Grade a mixed stack of papers against one key per paper")
+@max_body(MAX_PDF_BYTES, MAX_PDF_BYTES)  # the student PDF plus all keys together
+async def process_pdfs_multi(
+    student_pdf: UploadFile = File(..., description="Student sheets PDF (any mix of papers)"),
+    answer_keys: List[UploadFile] = File(..., description="One answer key PDF per paper"),
+    papers: Optional[List[str]] = Form(
+        None, description="Paper code for each key, in upload order (defaults to the key's file name)"
+    ),
+    concurrency: int = Query(GRADING_CONCURRENCY, ge=1, le=32, description="Pages graded in parallel"),
+    mode: str = Query(GRADING_MODE, pattern="^(llm|omr)$", description="Answer reading: llm or local omr"),
+):
+    """
+    Each page is routed by the Paper field read from its candidate info to
+    the matching key; all keys are parsed up front (and cached) in parallel.
+    """
+    if papers and len(papers) != len(answer_keys):
+        raise HTTPException(400, detail="Provide one paper code per answer key.")
+    codes = [
+        normalize_paper(papers[i] if papers else os.path.splitext(f.filename or "")[0])
+        for i, f in enumerate(answer_keys)
+    ]
+    if "" in codes or len(set(codes)) != len(codes):
+        raise HTTPException(400, detail="Paper codes must be non-empty and unique.")
+
+    try:
+        async with AsyncExitStack() as stack:
+            stud_path = await stack.enter_async_context(spooled(student_pdf, MAX_PDF_BYTES))
+            key_paths = [await stack.enter_async_context(spooled(f, MAX_PDF_BYTES)) for f in answer_keys]
+
+            parsed = await asyncio.gather(*(load_answer_key(p) for p in key_paths))
+            missing = [code for code, key in zip(codes, parsed) if key is None]
+            if missing:
+                raise HTTPException(400, detail=f"Could not parse answer key for paper(s): {', '.join(missing)}.")
+            keys_by_paper = dict(zip(codes, parsed))
+
+            job_id = await asyncio.to_thread(grading_jobs.create_job, None, answer_keys=keys_by_paper, mode=mode)
+            graded = [r async for r in run_grading_job(job_id, aiter_pages(stud_path), keys_by_paper, concurrency, mode)]
+        graded.sort(key=lambda r: r["Student Index"])
+
+        job = await asyncio.to_thread(grading_jobs.get_job, job_id)
+
+        return JSONResponse(
+            content={
+                "job_id": job_id,
+                "papers": codes,
+                "results": attach_answer_key(graded, keys_by_paper),
+                "analytics": job.get("analytics"),
+                "image_payload": payload_totals(graded),
+            }
+        )
 
     except HTTPException:
         raise
@@ -155,17 +431,90 @@ async def process_pdfs(
         raise HTTPException(500, detail=str(e))
 
 
-@router.get("/download", summary="Download latest grading results")
-async def download_results():
-    if not os.path.exists(RESULT_FILE):
+def get_job_or_404(job_id: str) -> dict:
+    job = grading_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Grading job not found.")
+    return job
+
+
+@router.get("/jobs/{job_id}", summary="Grading job status")
+async def job_status(job_id: str):
+    return JSONResponse(content=jsonable_encoder(await asyncio.to_thread(get_job_or_404, job_id)))
+
+
+@router.get("/jobs/{job_id}/analytics", summary="Item analysis and score distribution for a job")
+async def job_analytics(job_id: str):
+    job = await asyncio.to_thread(get_job_or_404, job_id)
+    if job["status"] != "completed":
+        raise HTTPException(409, detail=f"Job is {job['status']}; analytics are computed when it completes.")
+    return job.get("analytics") or {}
+
+
+@router.get("/jobs/{job_id}/results", summary="Page through a job's results")
+async def job_results(
+    job_id: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    paper: Optional[str] = Query(None, description="Only this paper code"),
+    candidate: Optional[str] = Query(None, description="Only this candidate number"),
+    failed: Optional[bool] = Query(None, description="Only failed (true) or graded (false) pages"),
+):
+    await asyncio.to_thread(get_job_or_404, job_id)
+    return await asyncio.to_thread(
+        grading_jobs.query_results, job_id, page, page_size, paper=paper, candidate=candidate, failed=failed
+    )
+
+
+@router.get("/jobs/{job_id}/export", summary="Export a job's results as CSV or Parquet")
+async def export_job(
+    job_id: str,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    paper: Optional[str] = Query(None, description="Only this paper code"),
+):
+    job = await asyncio.to_thread(get_job_or_404, job_id)
+    # the longest key decides the question columns
+    answer_key = max(job_answer_keys(job).values(), key=lambda k: len((k or {}).get("Answers") or {}))
+    if format == "parquet":
+        if grading_jobs.pa is None:
+            raise HTTPException(501, detail="Parquet export requires pyarrow.")
+        body, media_type = grading_jobs.iter_parquet(job_id, answer_key, paper=paper), "application/vnd.apache.parquet"
+    else:
+        body, media_type = grading_jobs.iter_csv(job_id, answer_key, paper=paper), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=result_cards_{job_id}.{format}"},
+    )
+
+
+@router.get("/download", summary="Download grading results (latest job by default)")
+async def download_results(job_id: Optional[str] = Query(None, description="Grading job to download")):
+    job_id = job_id or await asyncio.to_thread(grading_jobs.latest_job_id)
+    if job_id is None:
         raise HTTPException(404, detail="No results available. Run /check/process first.")
+    job = await asyncio.to_thread(get_job_or_404, job_id)
+    answer_keys = job_answer_keys(job)
+
+    def body():
+        yield f'{{"job_id": {json.dumps(job_id)}, "results": ['
+        for n, res in enumerate(grading_jobs.iter_results(job_id)):
+            res = attach_answer_key([res], answer_keys)[0]
+            yield (", " if n else "") + json.dumps(res, indent=2)
+        yield "]}"
+
     return StreamingResponse(
-        open(RESULT_FILE, "rb"),
+        body(),
         media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=result_cards.json"},
+        headers={"Content-Disposition": f"attachment; filename=result_cards_{job_id}.json"},
     )
 
 
+@router.get("/cache/stats", summary="Answer-key and OCR cache statistics")
+async def cache_stats():
+    return {"answer_keys": answer_key_cache.stats(), "ocr": ocr_cache.stats()}
+
+
 @router.get("/health", summary="Health check")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,11 @@
+# data_dir.py
+
+import os
+
+# State the app keeps on disk (video sessions, embedding and answer caches).
+# It lives outside the source tree so it is never committed or baked into an
+# image; point DATA_DIR at a volume to keep it across deploys. Each store
+# creates its directory when it first writes.
+DATA_DIR = os.getenv("DATA_DIR") or os.path.join(
+    os.getenv("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "edulearnai"
+)
@@ -0,0 +1,165 @@
+# embedding_cache.py
+
+import os
+import re
+import fcntl
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from data_dir import DATA_DIR
+
+# Shared by every worker; one vector file and one sqlite index per model
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(DATA_DIR, "embedding_cache"))
+
+SQL_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Chunk vectors keyed by the sha256 of the chunk text, for one model.
+    Vectors are appended as float16 rows to a flat file (half the size of
+    float32, plenty for normalized embeddings) and read back through a
+    memory map; a sqlite table maps text hash -> row. Appends take an
+    exclusive file lock so several workers can share the directory.
+    """
+
+    def __init__(self, model: str, root: str = EMBEDDING_CACHE_DIR):
+        os.makedirs(root, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.model = model
+        self.vectors_path = os.path.join(root, f"{name}.f16")
+        self.db = sqlite3.connect(os.path.join(root, f"{name}.sqlite"), check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._map = None
+        self._rows = 0
+
+    def _view(self) -> np.ndarray:
+        # re-map only when another writer has grown the file
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 2)
+        if rows == 0:
+            return np.empty((0, self.dim), dtype=np.float16)
+        if self._map is None or rows != self._rows:
+            self._map = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+            self._rows = rows
+        return self._map
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            self.misses += len(hashes)
+            return {}
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), SQL_BATCH):
+                part = hashes[i : i + SQL_BATCH]
+                found.update(self.db.execute(
+                    f"SELECT hash, row FROM vectors WHERE hash IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+            view = self._view()
+            vectors = {h: view[r].astype(np.float32).tolist() for h, r in found.items() if r < len(view)}
+        self.hits += len(vectors)
+        self.misses += len(hashes) - len(vectors)
+        return vectors
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]):
+        arr = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            if self.dim is None:
+                self.dim = arr.shape[1]
+                self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+                self.db.commit()
+            if arr.shape[1] != self.dim:
+                return
+            row_bytes = self.dim * 2
+            with open(self.vectors_path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # drop a partial row left by a writer that died mid-append
+                    start = f.seek(0, os.SEEK_END) // row_bytes
+                    f.truncate(start * row_bytes)
+                    f.write(arr.tobytes())
+                    f.flush()
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO vectors (hash, row) VALUES (?, ?)",
+                        [(h, start + i) for i, h in enumerate(hashes)],
+                    )
+                    self.db.commit()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Serves document embeddings from an EmbeddingCache and sends only unseen
+    chunks to `inner`; queries always go to `inner`. Fresh vectors are
+    rounded to float16 too, so a chunk embeds the same whether or not it
+    was cached.
+    """
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    def _lookup(self, texts: List[str]):
+        hashes = [text_hash(t) for t in texts]
+        unique = dict(zip(hashes, texts))
+        found = self.cache.get_many(list(unique))
+        missing = [h for h in unique if h not in found]
+        return hashes, found, missing, [unique[h] for h in missing]
+
+    def _store(self, found: dict, missing: List[str], vectors: List[List[float]]):
+        self.cache.put_many(missing, vectors)
+        rounded = np.asarray(vectors, dtype=np.float16).astype(np.float32).tolist()
+        found.update(zip(missing, rounded))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing, missing_texts = self._lookup(texts)
+        if missing:
+            self._store(found, missing, self.inner.embed_documents(missing_texts))
+        return [found[h] for h in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing, missing_texts = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            vectors = await self.inner.aembed_documents(missing_texts)
+            await asyncio.to_thread(self._store, found, missing, vectors)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.inner.aembed_query(text)
+
+    def stats(self) -> dict:
+        inner = self.inner.stats() if hasattr(self.inner, "stats") else {}
+        return {"cache": self.cache.stats(), "batching": inner}
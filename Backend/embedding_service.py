@@ -0,0 +1,117 @@
+# embedding_service.py
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+# A batch is sent once it holds this many texts or its first request has
+# waited this long, whichever comes first
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+
+
+class _Request:
+    __slots__ = ("texts", "kind", "future")
+
+    def __init__(self, texts: List[str], kind: str):
+        self.texts = texts
+        self.kind = kind
+        self.future = Future()
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that funnels every caller through one worker thread.
+    Requests arriving together (retrieval queries, transcript chunks, bot
+    documents) are merged into one model call of up to `max_batch` texts;
+    a lone request waits at most `max_wait_ms` for company. submit()
+    returns a Future; the LangChain sync/async methods wrap it.
+    """
+
+    def __init__(self, base: Embeddings, max_batch: int = EMBED_BATCH_SIZE, max_wait_ms: float = EMBED_BATCH_WAIT_MS):
+        self.base = base
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str], kind: str = "documents") -> Future:
+        req = _Request(list(texts), kind)
+        if not req.texts:
+            req.future.set_result([])
+        else:
+            self._queue.put(req)
+        return req.future
+
+    # ——— LangChain interface ———————————————————————————————
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text], "query").result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await asyncio.wrap_future(self.submit([text], "query")))[0]
+
+    # ——— Worker ————————————————————————————————————————————
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(req)
+                size += len(req.texts)
+            for kind in ("documents", "query"):
+                group = [r for r in batch if r.kind == kind and r.future.set_running_or_notify_cancel()]
+                if group:
+                    self._embed(group, kind)
+
+    def _embed(self, group: List[_Request], kind: str):
+        texts = [t for r in group for t in r.texts]
+        try:
+            if kind == "query" and getattr(self.base, "query_encode_kwargs", None):
+                # queries are encoded differently from documents for this model
+                vectors = [self.base.embed_query(t) for t in texts]
+            else:
+                vectors = self.base.embed_documents(texts)
+        except Exception as e:
+            for r in group:
+                r.future.set_exception(e)
+            return
+        self.requests += len(group)
+        self.batches += 1
+        self.texts += len(texts)
+        start = 0
+        for r in group:
+            r.future.set_result(vectors[start : start + len(r.texts)])
+            start += len(r.texts)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_texts": self.texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
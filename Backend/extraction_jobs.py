@@ -0,0 +1,87 @@
+# extraction_jobs.py
+
+import uuid
+from datetime import datetime
+from typing import Optional
+from pymongo import MongoClient, ASCENDING, DESCENDING
+
+from config import CONNECTION_STRING
+import job_owner
+
+_client = MongoClient(CONNECTION_STRING)
+_db = _client["edulearnai"]
+jobs_collection = _db["extraction_jobs"]
+pages_collection = _db["extraction_pages"]
+
+jobs_collection.create_index([("created_at", DESCENDING)])
+pages_collection.create_index([("job_id", ASCENDING), ("page", ASCENDING)], unique=True)
+
+
+# ——— Jobs ————————————————————————————————————————————————————
+
+def create_job(filename: str, **meta) -> str:
+    job_id = str(uuid.uuid4())
+    jobs_collection.insert_one(
+        {
+            "_id": job_id,
+            "status": "queued",
+            "filename": filename,
+            "total": None,
+            "done": 0,
+            "owner": job_owner.current(),
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            **meta,
+        }
+    )
+    return job_id
+
+
+def start_job(job_id: str, total: int):
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "running", "total": total, "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+    )
+
+
+def finish_job(job_id: str, status: str = "completed", **fields):
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow(), **fields}},
+    )
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    job = jobs_collection.find_one({"_id": job_id})
+    if job:
+        job["job_id"] = job.pop("_id")
+    return job
+
+
+def fail_if_orphaned(job: dict, live: bool) -> dict:
+    """
+    Marks a queued/running job failed when the process running it is gone
+    (see job_owner); `live` says whether this process holds its task.
+    """
+    if job["status"] in ("queued", "running"):
+        idle = (datetime.utcnow() - job.get("updated_at", job["created_at"])).total_seconds()
+        if job_owner.orphaned(job.get("owner"), idle, live):
+            finish_job(job["job_id"], "failed", error="Interrupted by a server restart")
+            job = get_job(job["job_id"])
+    return job
+
+
+# ——— Pages ———————————————————————————————————————————————————
+
+def save_page(job_id: str, page: int, text: str, method: str):
+    pages_collection.replace_one(
+        {"job_id": job_id, "page": page},
+        {"job_id": job_id, "page": page, "text": text, "method": method},
+        upsert=True,
+    )
+    jobs_collection.update_one({"_id": job_id}, {"$inc": {"done": 1}, "$set": {"updated_at": datetime.utcnow()}})
+
+
+def job_pages(job_id: str) -> list:
+    cursor = pages_collection.find({"job_id": job_id}, {"_id": 0, "job_id": 0}).sort("page", ASCENDING)
+    return list(cursor)
@@ -1,12 +1,19 @@
 # extraction_routes.py
 import os
-import io
-import time
+import json
+import asyncio
 import PIL.Image
-from fastapi import APIRouter, File, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pdf2image import convert_from_bytes
-from google import genai
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pdf_utils import aiter_pages, has_text_layer, page_count, page_texts
+from async_utils import as_completed_bounded
+import image_prep
+import ocr_cache
+import extraction_jobs
+import model_registry
+from uploads import MAX_IMAGE_BYTES, MAX_PDF_BYTES, discard, max_body, spool
+from rate_limiter import gemini_generate
 from google.genai.errors import ClientError
 
 router = APIRouter()
@@ -15,63 +22,308 @@ API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("API_KEY environment variable is not set")
 
-client = genai.Client(api_key=API_KEY)
+client = model_registry.genai_client(API_KEY)
 
-def extract_text_from_image(img):
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[
-                    "Extract the text from the image. Do not write anything except the extracted content",
-                    img,
-                ]
+# Pages of one upload OCR'd at the same time
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "4"))
+# Background extraction jobs run at the same time; the rest wait as "queued"
+EXTRACTION_JOB_CONCURRENCY = int(os.getenv("EXTRACTION_JOB_CONCURRENCY", "2"))
+
+async def extract_text_from_image(img):
+    try:
+        response = await gemini_generate(
+            client,
+            model="gemini-2.0-flash",
+            contents=[
+                "Extract the text from the image. Do not write anything except the extracted content",
+                img,
+            ]
+        )
+        return response.text
+    except ClientError as e:
+        if getattr(e, "code", None) == 429:
+            # still rate limited after the shared limiter's retries
+            raise HTTPException(
+                status_code=503,
+                detail="API resource exhausted. Please try again later."
             )
-            return response.text
-        except ClientError as e:
-            error_code = e.args[0] if e.args and isinstance(e.args[0], int) else None
-            if error_code == 429:
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="API resource exhausted. Please try again later."
-                    )
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error processing image: {str(e)}"
-                )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing image: {str(e)}"
+        )
 
-@router.post("/upload", summary="Upload a PDF or image file", response_description="Returns extracted text as JSON")
-async def upload_file(file: UploadFile = File(...)):
+async def ocr_image(img, payload: dict):
+    """
+    OCR one page image, served from the OCR cache when the page was seen
+    before. Returns (text, cache_hit) and adds the image payload savings
+    to `payload`.
+    """
+    fp = await asyncio.to_thread(ocr_cache.fingerprint, img)
+    text = await asyncio.to_thread(ocr_cache.lookup, "ocr", fp)
+    if text is not None:
+        return text, True
+    part, stats = await asyncio.to_thread(image_prep.to_part, img)
+    for k in payload:
+        payload[k] += stats[k]
+    text = await extract_text_from_image(part)
+    await asyncio.to_thread(ocr_cache.store, "ocr", fp, text)
+    return text, False
+
+
+def is_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf")
+
+
+async def iter_page_texts(path: str, filename: str, payload: dict, on_total=None):
+    """
+    Yields (page, text, method) for every page of an upload as soon as it is
+    ready: text-layer pages first, then OCR'd scans in completion order, at
+    most OCR_CONCURRENCY at a time. `on_total` is awaited with the page count
+    before the first page. Failures are raised as HTTPException.
+    """
+    payload.update({"raw_bytes": 0, "sent_bytes": 0, "saved_bytes": 0})
+    if not is_pdf(filename):
+        try:
+            img = PIL.Image.open(path)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
+        if on_total:
+            await on_total(1)
+        text, hit = await ocr_image(img, payload)
+        yield 1, text, "ocr_cache" if hit else "ocr"
+        return
+
+    async def ocr_page(idx, img):
+        text, hit = await ocr_image(img, payload)
+        return idx, text, "ocr_cache" if hit else "ocr"
+
+    try:
+        total = await asyncio.to_thread(page_count, path)
+        # digital pages are read straight from the text layer, scans go to the vision model
+        try:
+            texts = await asyncio.to_thread(page_texts, path)
+        except Exception:
+            texts = []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error converting PDF: {str(e)}")
+    if on_total:
+        await on_total(total)
+    layered = set()
+    for idx, text in enumerate(texts[:total], start=1):
+        if has_text_layer(text):
+            layered.add(idx)
+            yield idx, text.strip(), "text_layer"
+
+    # OCR pages concurrently as they are decoded; the Gemini limiter paces the calls
+    scanned = [idx for idx in range(1, total + 1) if idx not in layered]
+    ocr = as_completed_bounded(aiter_pages(path, dpi=200, numbers=scanned), ocr_page, OCR_CONCURRENCY)
+    try:
+        async for item in ocr:
+            yield item
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error converting PDF: {str(e)}")
+    finally:
+        await ocr.aclose()  # stops outstanding OCR now if the caller stops early
+
+
+def page_block(idx: int, text: str) -> str:
+    return f"### Page {idx}\n\n{text}\n\n"
+
+
+def render_text(page_text: dict, filename: str) -> str:
+    if not is_pdf(filename):
+        return "".join(f"{page_text[idx]}\n\n" for idx in sorted(page_text))
+    return "".join(page_block(idx, page_text[idx]) for idx in sorted(page_text))
+
+
+async def spool_upload(file: UploadFile) -> str:
+    """
+    Spools the upload to disk and returns its path; callers discard() it.
+    """
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
-    
-    file_contents = await file.read()
-    output_text = ""
+    return await spool(file, MAX_PDF_BYTES if is_pdf(file.filename) else MAX_IMAGE_BYTES)
+
+
+@router.post("/upload", summary="Upload a PDF or image file", response_description="Returns extracted text as JSON")
+@max_body(max(MAX_PDF_BYTES, MAX_IMAGE_BYTES))
+async def upload_file(file: UploadFile = File(...)):
+    path = await spool_upload(file)
+    payload = {}
+    page_text = {}
+    methods = {}  # page -> "text_layer", "ocr" or "ocr_cache"
+    try:
+        async for idx, text, method in iter_page_texts(path, file.filename, payload):
+            page_text[idx] = text
+            methods[idx] = method
+    finally:
+        discard(path)
+
+    return JSONResponse(
+        content={
+            "extracted_text": render_text(page_text, file.filename),
+            "pages": [{"page": idx, "method": methods[idx]} for idx in sorted(methods)],
+            "image_payload": payload,
+        }
+    )
+
+
+@router.post("/upload/stream", summary="Upload a PDF or image file and stream each page as it is extracted")
+@max_body(max(MAX_PDF_BYTES, MAX_IMAGE_BYTES))
+async def upload_file_stream(
+    file: UploadFile = File(...),
+    format: str = Query("markdown", pattern="^(markdown|sse)$", description="markdown (chunked) or sse (server-sent events)"),
+):
+    """
+    markdown: "### Page N" blocks in completion order.
+    sse: a "total" event, one "page" event per page ({page, method, text}),
+    then a "summary" event with the image payload; failures end the stream
+    with an "error" event.
+    """
+    # the spooled file lives until the stream finishes
+    path = await spool_upload(file)
+    payload = {}
 
-    if file.filename.lower().endswith(".pdf"):
+    if format == "markdown":
+        async def stream():
+            try:
+                async for idx, text, _ in iter_page_texts(path, file.filename, payload):
+                    yield page_block(idx, text)
+            finally:
+                discard(path)
+
+        return StreamingResponse(stream(), media_type="text/markdown")
+
+    def event(kind: str, data: dict) -> str:
+        return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+    async def stream():
+        # pages are pumped from a task so "total" goes out as soon as the page
+        # count is known, not when the first page is done
+        events: asyncio.Queue = asyncio.Queue()
+        end = object()
+
+        async def on_total(total):
+            await events.put(event("total", {"pages": total}))
+
+        async def pump():
+            count = 0
+            try:
+                async for idx, text, method in iter_page_texts(path, file.filename, payload, on_total=on_total):
+                    count += 1
+                    await events.put(event("page", {"page": idx, "method": method, "text": text}))
+                await events.put(event("summary", {"pages": count, "image_payload": payload}))
+            except HTTPException as e:
+                await events.put(event("error", {"status_code": e.status_code, "detail": e.detail}))
+            finally:
+                discard(path)
+                events.put_nowait(end)
+
+        pumping = asyncio.create_task(pump())
         try:
-            images = convert_from_bytes(file_contents, dpi=200)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error converting PDF: {str(e)}")
-        
-        for idx, img in enumerate(images, start=1):
-            page_text = extract_text_from_image(img)
-            output_text += f"### Page {idx}\n\n{page_text}\n\n"
-    else:
+            while True:
+                item = await events.get()
+                if item is end:
+                    break
+                yield item
+        finally:
+            pumping.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+# ——— Background extraction jobs ——————————————————————————————
+
+_job_slots = None  # created on first use so it binds to the server's event loop
+_job_tasks = {}  # job_id -> task; keeps running jobs referenced until they finish
+
+
+async def run_extraction_job(job_id: str, path: str, filename: str):
+    """
+    Owns the spooled upload at `path` and removes it when the job ends.
+    """
+    async def on_total(total):
+        await asyncio.to_thread(extraction_jobs.start_job, job_id, total)
+
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(EXTRACTION_JOB_CONCURRENCY)
+    payload = {}
+    async with _job_slots:
         try:
-            img = PIL.Image.open(io.BytesIO(file_contents))
+            async for idx, text, method in iter_page_texts(path, filename, payload, on_total=on_total):
+                await asyncio.to_thread(extraction_jobs.save_page, job_id, idx, text, method)
+        except HTTPException as e:
+            await asyncio.to_thread(extraction_jobs.finish_job, job_id, "failed", error=e.detail)
+            return
+        except asyncio.CancelledError:
+            await asyncio.to_thread(extraction_jobs.finish_job, job_id, "failed", error="Interrupted by a server shutdown")
+            raise
         except Exception as e:
-            raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
-        
-        output_text += extract_text_from_image(img) + "\n\n"
-    
-    return JSONResponse(content={"extracted_text": output_text})
+            await asyncio.to_thread(extraction_jobs.finish_job, job_id, "failed", error=str(e))
+            raise
+        finally:
+            discard(path)
+        await asyncio.to_thread(extraction_jobs.finish_job, job_id, image_payload=payload)
+
+
+def get_extraction_job_or_404(job_id: str) -> dict:
+    job = extraction_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Extraction job not found.")
+    return extraction_jobs.fail_if_orphaned(job, live=job_id in _job_tasks)
+
+
+@router.post("/upload/jobs", summary="Extract a large file in the background", status_code=202)
+@max_body(max(MAX_PDF_BYTES, MAX_IMAGE_BYTES))
+async def create_upload_job(file: UploadFile = File(...)):
+    path = await spool_upload(file)
+    try:
+        job_id = await asyncio.to_thread(extraction_jobs.create_job, file.filename)
+    except BaseException:
+        discard(path)
+        raise
+    task = asyncio.create_task(run_extraction_job(job_id, path, file.filename))
+    _job_tasks[job_id] = task
+    task.add_done_callback(lambda _: _job_tasks.pop(job_id, None))
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/upload/jobs/{job_id}", summary="Progress of a background extraction job")
+async def get_upload_job(job_id: str):
+    job = await asyncio.to_thread(get_extraction_job_or_404, job_id)
+    total = job.get("total")
+    job["progress"] = job["done"] / total if total else 0.0
+    return jsonable_encoder(job)
+
+
+@router.get("/upload/jobs/{job_id}/text", summary="Text extracted so far by a background job")
+async def get_upload_job_text(job_id: str):
+    """
+    Available while the job runs; "complete" tells whether every page is in.
+    """
+    job = await asyncio.to_thread(get_extraction_job_or_404, job_id)
+    pages = await asyncio.to_thread(extraction_jobs.job_pages, job_id)
+    return JSONResponse(
+        content={
+            "job_id": job_id,
+            "status": job["status"],
+            "complete": job["status"] == "completed",
+            "extracted_text": render_text({p["page"]: p["text"] for p in pages}, job["filename"]),
+            "pages": [{"page": p["page"], "method": p["method"]} for p in pages],
+        }
+    )
+
+
+@router.get("/image_prep/stats", summary="Bytes saved by image preprocessing since startup")
+async def image_prep_stats():
+    return JSONResponse(content=image_prep.stats())
+
+@router.get("/ocr_cache/stats", summary="OCR result cache hit rate and size")
+async def ocr_cache_stats():
+    return JSONResponse(content=ocr_cache.stats())
 
 @router.get("/", summary="Health Check for Extraction")
 async def root():
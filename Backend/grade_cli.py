@@ -0,0 +1,177 @@
+# grade_cli.py
+"""
+Offline batch grading for large exam sessions, built on the check.py pipeline.
+
+    python grade_cli.py STUDENTS_DIR --key "Paper K.pdf" --out results/
+    python grade_cli.py STUDENTS_DIR --key K=keys/k.pdf --key L=keys/l.pdf --mode omr
+
+Student PDFs are rasterized and preprocessed on a process pool, model calls
+are capped at --concurrency in flight (on top of the shared Gemini rate
+limit), and every finished file is written
+to OUT/<name>.json as soon as it is graded (file names that would collide
+there are refused up front). Running again with the same OUT
+skips files that already have results, so an interrupted session resumes
+where it stopped. Class analytics for everything in OUT go to
+OUT/analytics.json at the end.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from page_prep import GRADING_MODE, prepare_pdf
+from pdf_utils import PDF_DPI
+
+# Spawned workers re-import this module, so it imports only page_prep at the
+# top; check (MongoClients, GENAI_API_KEY) is imported inside the functions
+# that run in the parent process.
+
+ANALYTICS_FILE = "analytics.json"
+
+
+async def load_keys(specs: list) -> dict:
+    """
+    "--key file.pdf" grades every page against one key; "--key K=file.pdf"
+    (repeatable) routes pages by the paper code on the sheet.
+    """
+    import check
+
+    answer_keys = {}
+    for spec in specs:
+        code, _, path = spec.rpartition("=")
+        code = check.normalize_paper(code) if code else "*"
+        key = await check.load_answer_key(path)
+        if key is None:
+            raise SystemExit(f"Could not parse answer key {path}")
+        answer_keys[code] = key
+    return answer_keys
+
+
+def result_path(out_dir: str, name: str) -> str:
+    return os.path.join(out_dir, os.path.splitext(name)[0] + ".json")
+
+
+def clashing_names(files: list) -> list:
+    """
+    Student files whose result would overwrite another's or the analytics:
+    stems equal ignoring case ("a.pdf", "a.PDF"; case-insensitive
+    filesystems too) or the analytics file's own stem.
+    """
+    by_stem = {}
+    for name in files:
+        by_stem.setdefault(os.path.splitext(name)[0].lower(), []).append(name)
+    reserved = os.path.splitext(ANALYTICS_FILE)[0]
+    return sorted(n for stem, names in by_stem.items() if len(names) > 1 or stem == reserved for n in names)
+
+
+def write_atomic(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+async def grade_prepared(prepared: list, answer_keys: dict, model_slots: asyncio.Semaphore) -> list:
+    import check
+
+    async def one(idx, prep):
+        async with model_slots:
+            try:
+                return await check.grade_prepared_page(idx, prep, answer_keys)
+            except Exception as e:
+                return {"Student Index": idx, "Error": str(e)}
+
+    results = await asyncio.gather(*(one(idx, prep) for idx, prep in prepared))
+    return [r for r in results if r is not None]
+
+
+async def run(args) -> int:
+    import check
+
+    files = sorted(f for f in os.listdir(args.students_dir) if f.lower().endswith(".pdf"))
+    clashes = clashing_names(files)
+    if clashes:
+        raise SystemExit(f"Rename these PDFs, their results would overwrite each other or {ANALYTICS_FILE}: {', '.join(clashes)}")
+    os.makedirs(args.out, exist_ok=True)
+    todo = [f for f in files if not os.path.exists(result_path(args.out, f))]
+    print(f"{len(files)} PDFs found, {len(files) - len(todo)} already graded, {len(todo)} to go")
+
+    answer_keys = await load_keys(args.key)
+    loop = asyncio.get_running_loop()
+    model_slots = asyncio.Semaphore(args.concurrency)
+    # bounds how many rasterized files wait in memory for the model
+    files_in_flight = asyncio.Semaphore(args.workers * 2)
+    started = time.monotonic()
+    totals = {"files": 0, "pages": 0, "failed_pages": 0, "failed_files": 0}
+
+    # spawned, not forked: importing check has already opened MongoClients,
+    # which must not be copied into child processes; workers load page_prep only
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+
+        async def handle(name: str):
+            path = os.path.join(args.students_dir, name)
+            async with files_in_flight:
+                try:
+                    prepared = await loop.run_in_executor(pool, prepare_pdf, path, args.dpi, args.mode)
+                except Exception as e:
+                    totals["failed_files"] += 1
+                    print(f"  ! {name}: could not rasterize ({e}); will retry on the next run", file=sys.stderr)
+                    return
+                results = await grade_prepared(prepared, answer_keys, model_slots)
+
+            write_atomic(result_path(args.out, name), {"file": name, "results": results})
+
+            failed = sum(1 for r in results if "Error" in r)
+            totals["files"] += 1
+            totals["pages"] += len(prepared)
+            totals["failed_pages"] += failed
+            rate = totals["pages"] / (time.monotonic() - started)
+            print(f"[{totals['files']}/{len(todo)}] {name}: {len(prepared)} pages, {failed} failed - {rate:.2f} pages/s")
+
+        await asyncio.gather(*(handle(name) for name in todo))
+
+    elapsed = time.monotonic() - started
+    print(
+        f"Graded {totals['pages']} pages from {totals['files']} files in {elapsed:.1f}s "
+        f"({totals['pages'] / elapsed if elapsed else 0:.2f} pages/s); "
+        f"{totals['failed_pages']} pages and {totals['failed_files']} files failed"
+    )
+
+    # class analytics over every file graded into OUT so far
+    all_results = []
+    for name in files:
+        if os.path.exists(result_path(args.out, name)):
+            with open(result_path(args.out, name), encoding="utf-8") as f:
+                all_results.extend(json.load(f)["results"])
+    unknown = {r.get("Paper Key", "*") for r in all_results if "Error" not in r and r.get("Paper Key", "*") not in answer_keys}
+    if unknown:
+        print(
+            f"Analytics skip papers without a key on this run: {', '.join(sorted(unknown))}",
+            file=sys.stderr,
+        )
+    write_atomic(os.path.join(args.out, ANALYTICS_FILE), check.batch_analytics(all_results, answer_keys))
+    return 1 if totals["failed_files"] else 0
+
+
+def main(argv=None) -> int:
+    import check
+
+    parser = argparse.ArgumentParser(description="Grade a directory of student answer-sheet PDFs.")
+    parser.add_argument("students_dir", help="Directory containing student PDFs")
+    parser.add_argument("--key", action="append", required=True, help="Answer key PDF, or PAPER=path (repeatable)")
+    parser.add_argument("--out", default="grading_results", help="Output directory (also the resume state)")
+    parser.add_argument("--mode", choices=("llm", "omr"), default=GRADING_MODE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Rasterization processes")
+    parser.add_argument("--concurrency", type=int, default=check.GRADING_CONCURRENCY, help="Model calls in flight")
+    parser.add_argument("--dpi", type=int, default=PDF_DPI)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
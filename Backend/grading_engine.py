@@ -0,0 +1,120 @@
+# grading_engine.py
+
+import os
+from typing import List
+import numpy as np
+
+# Questions per sheet and marks per answer, overridable per call
+GRADING_QUESTIONS = int(os.getenv("GRADING_QUESTIONS", "15"))
+MARK_CORRECT = float(os.getenv("MARK_CORRECT", "1"))
+# Marks deducted per wrong answer (blank answers are never penalised)
+NEGATIVE_MARKING = float(os.getenv("NEGATIVE_MARKING", "0"))
+
+# Share of top/bottom scorers compared for the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+
+def _answer_matrix(answer_sets: List[dict], questions: List[str]) -> np.ndarray:
+    rows = [[str((answers or {}).get(q) or "").strip() for q in questions] for answers in answer_sets]
+    return np.array(rows, dtype=str).reshape(len(answer_sets), len(questions))
+
+
+def score_batch(
+    student_answers: List[dict],
+    answer_key: dict,
+    num_questions: int = GRADING_QUESTIONS,
+    mark: float = MARK_CORRECT,
+    negative_mark: float = NEGATIVE_MARKING,
+) -> dict:
+    """
+    Scores every student in one (students x questions) matrix comparison.
+    Takes {"Answers": {...}} dicts as returned by parse_all_answers and returns
+    the per-student correctness/answered matrices plus their marks.
+    """
+    questions = [str(q) for q in range(1, num_questions + 1)]
+    students = _answer_matrix([(s or {}).get("Answers", {}) for s in student_answers], questions)
+    key = _answer_matrix([(answer_key or {}).get("Answers", {})], questions)[0]
+
+    answered = students != ""
+    correct = (students == key) & answered & (key != "")
+    wrong = answered & ~correct
+    marks = correct.sum(axis=1) * mark - wrong.sum(axis=1) * negative_mark
+    return {
+        "questions": questions,
+        "students": students,
+        "key": key,
+        "correct": correct,
+        "answered": answered,
+        "marks": marks,
+        "max_marks": num_questions * mark,
+    }
+
+
+def student_result(scored: dict, i: int) -> dict:
+    """
+    Row i of a score_batch result in the calculate_result response shape.
+    """
+    detailed = {
+        q: {
+            "Student": str(scored["students"][i, j]),
+            "Correct": str(scored["key"][j]),
+            "Result": "Correct" if scored["correct"][i, j] else "Incorrect",
+        }
+        for j, q in enumerate(scored["questions"])
+    }
+    marks = float(scored["marks"][i])
+    max_marks = scored["max_marks"]
+    return {
+        "Total Marks": int(marks) if marks.is_integer() else marks,
+        "Total Questions": len(scored["questions"]),
+        "Percentage": marks / max_marks * 100 if max_marks else 0.0,
+        "Detailed Results": detailed,
+    }
+
+
+def item_analysis(scored: dict, bins: int = 10) -> dict:
+    """
+    Class-level statistics for one key: per-question difficulty (share of
+    students answering correctly), discrimination index (difficulty in the
+    top group minus the bottom group) and the score distribution.
+    """
+    correct = scored["correct"]
+    n = correct.shape[0]
+    if n == 0:
+        return {"Students": 0}
+
+    pct = scored["marks"] / scored["max_marks"] * 100 if scored["max_marks"] else np.zeros(n)
+    difficulty = correct.mean(axis=0)
+    omitted = 1.0 - scored["answered"].mean(axis=0)
+
+    group = max(1, int(round(n * DISCRIMINATION_GROUP)))
+    ranked = np.argsort(scored["marks"], kind="stable")
+    discrimination = correct[ranked[-group:]].mean(axis=0) - correct[ranked[:group]].mean(axis=0)
+
+    counts, edges = np.histogram(np.clip(pct, 0, 100), bins=bins, range=(0, 100))
+    return {
+        "Students": n,
+        "Questions": {
+            q: {
+                "Difficulty": float(difficulty[j]),
+                "Discrimination": float(discrimination[j]),
+                "Omitted": float(omitted[j]),
+            }
+            for j, q in enumerate(scored["questions"])
+        },
+        "Scores": {
+            "Mean": float(pct.mean()),
+            "Median": float(np.median(pct)),
+            "Std": float(pct.std()),
+            "Min": float(pct.min()),
+            "Max": float(pct.max()),
+            "Distribution": [
+                {"From": float(edges[b]), "To": float(edges[b + 1]), "Count": int(counts[b])} for b in range(bins)
+            ],
+        },
+    }
+
+
+def question_count(answer_key: dict) -> int:
+    return len((answer_key or {}).get("Answers") or {}) or GRADING_QUESTIONS
+
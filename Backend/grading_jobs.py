@@ -0,0 +1,239 @@
+# grading_jobs.py
+
+import io
+import csv
+import uuid
+from datetime import datetime
+from typing import Iterator, Optional
+from pymongo import MongoClient, ASCENDING, DESCENDING
+
+from config import CONNECTION_STRING
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet export is optional
+    pa = pq = None
+
+_client = MongoClient(CONNECTION_STRING)
+_db = _client["edulearnai"]
+jobs_collection = _db["grading_jobs"]
+results_collection = _db["grading_results"]
+
+jobs_collection.create_index([("created_at", DESCENDING)])
+results_collection.create_index([("job_id", ASCENDING), ("student_index", ASCENDING)], unique=True)
+results_collection.create_index([("job_id", ASCENDING), ("candidate_number", ASCENDING)])
+results_collection.create_index([("job_id", ASCENDING), ("paper", ASCENDING)])
+
+EXPORT_BATCH_SIZE = 500
+
+
+# ——— Jobs ————————————————————————————————————————————————————
+
+def create_job(answer_key: Optional[dict], **meta) -> str:
+    job_id = str(uuid.uuid4())
+    jobs_collection.insert_one(
+        {
+            "_id": job_id,
+            "status": "running",
+            "answer_key": answer_key,
+            "graded": 0,
+            "failed": 0,
+            "created_at": datetime.utcnow(),
+            **meta,
+        }
+    )
+    return job_id
+
+
+def finish_job(job_id: str, status: str = "completed", **fields):
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "finished_at": datetime.utcnow(), **fields}},
+    )
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    job = jobs_collection.find_one({"_id": job_id})
+    if job:
+        job["job_id"] = job.pop("_id")
+    return job
+
+
+def latest_job_id() -> Optional[str]:
+    job = jobs_collection.find_one({}, {"_id": 1}, sort=[("created_at", DESCENDING)])
+    return job["_id"] if job else None
+
+
+# ——— Results —————————————————————————————————————————————————
+
+def normalize_paper(paper) -> str:
+    # "Paper K", "paper-k" and "K" all route to "K"
+    code = str(paper or "").strip().upper()
+    if code.startswith("PAPER"):
+        code = code[5:].strip(" :-_")
+    return code
+
+
+def save_result(job_id: str, result: dict):
+    info = result.get("Candidate Info") or {}
+    error = result.get("Error")
+    # the code the page was routed by, so ?paper=K matches sheets reading "Paper K"
+    paper = result.get("Paper Key") or normalize_paper(info.get("Paper")) or None
+    results_collection.replace_one(
+        {"job_id": job_id, "student_index": result["Student Index"]},
+        {
+            "job_id": job_id,
+            "student_index": result["Student Index"],
+            "candidate_number": info.get("Number"),
+            "paper": paper,
+            "percentage": (result.get("Result") or {}).get("Percentage"),
+            "error": error,
+            "result": result,
+        },
+        upsert=True,
+    )
+    jobs_collection.update_one({"_id": job_id}, {"$inc": {"failed" if error else "graded": 1}})
+
+
+def _results_filter(job_id: str, paper: str = None, candidate: str = None, failed: bool = None) -> dict:
+    query = {"job_id": job_id}
+    if paper is not None:
+        query["paper"] = normalize_paper(paper)
+    if candidate is not None:
+        query["candidate_number"] = candidate
+    if failed is not None:
+        query["error"] = {"$ne": None} if failed else None
+    return query
+
+
+def query_results(job_id: str, page: int = 1, page_size: int = 50, **filters) -> dict:
+    query = _results_filter(job_id, **filters)
+    cursor = (
+        results_collection.find(query, {"_id": 0, "result": 1})
+        .sort("student_index", ASCENDING)
+        .skip((page - 1) * page_size)
+        .limit(page_size)
+    )
+    return {
+        "job_id": job_id,
+        "page": page,
+        "page_size": page_size,
+        "total": results_collection.count_documents(query),
+        "results": [d["result"] for d in cursor],
+    }
+
+
+def iter_results(job_id: str, **filters) -> Iterator[dict]:
+    cursor = (
+        results_collection.find(_results_filter(job_id, **filters), {"_id": 0, "result": 1})
+        .sort("student_index", ASCENDING)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    for doc in cursor:
+        yield doc["result"]
+
+
+# ——— Export ——————————————————————————————————————————————————
+
+def export_columns(answer_key: Optional[dict]) -> list:
+    questions = list(((answer_key or {}).get("Answers") or {}).keys())
+    return (
+        ["Student Index", "Name", "Number", "Country", "Level", "Paper"]
+        + ["Total Marks", "Total Questions", "Percentage", "Answer Source", "Error"]
+        + [f"Q{q}" for q in questions]
+    )
+
+
+def flatten_result(result: dict, columns: list) -> dict:
+    info = result.get("Candidate Info") or {}
+    score = result.get("Result") or {}
+    answers = (result.get("Student Answers") or {}).get("Answers") or {}
+    row = {
+        "Student Index": result.get("Student Index"),
+        "Total Marks": score.get("Total Marks"),
+        "Total Questions": score.get("Total Questions"),
+        "Percentage": score.get("Percentage"),
+        "Answer Source": result.get("Answer Source"),
+        "Error": result.get("Error"),
+    }
+    for col in columns:
+        if col in ("Name", "Number", "Country", "Level", "Paper"):
+            row[col] = info.get(col)
+        elif col.startswith("Q") and col[1:].isdigit():
+            row[col] = answers.get(col[1:])
+    return row
+
+
+def iter_csv(job_id: str, answer_key: Optional[dict], **filters) -> Iterator[str]:
+    columns = export_columns(answer_key)
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns)
+    writer.writeheader()
+    for n, result in enumerate(iter_results(job_id, **filters), start=1):
+        writer.writerow(flatten_result(result, columns))
+        if n % EXPORT_BATCH_SIZE == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands its bytes back on drain(), for streaming parquet."""
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(column: str):
+    if column in ("Student Index", "Total Questions"):
+        return pa.int64()
+    if column in ("Total Marks", "Percentage"):
+        return pa.float64()
+    return pa.string()
+
+
+def iter_parquet(job_id: str, answer_key: Optional[dict], **filters) -> Iterator[bytes]:
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; parquet export is unavailable")
+    columns = export_columns(answer_key)
+    schema = pa.schema([(c, _arrow_type(c)) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_batch(rows):
+        for row in rows:
+            for c in columns:
+                if schema.field(c).type == pa.string() and row.get(c) is not None:
+                    row[c] = str(row[c])
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+    batch = []
+    for result in iter_results(job_id, **filters):
+        batch.append(flatten_result(result, columns))
+        if len(batch) == EXPORT_BATCH_SIZE:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
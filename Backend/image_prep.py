@@ -0,0 +1,201 @@
+# image_prep.py
+
+import io
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+import cv2
+from PIL import Image
+from google.genai import types
+
+logger = logging.getLogger("uvicorn")
+
+# ——— Defaults (overridable per call) —————————————————————————————
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(1600 * 1600)))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "1") == "1"
+# One in this many rendered pages is PNG-encoded to measure what the SDK would
+# have uploaded; the rest are estimated from the bytes per pixel measured so far
+IMAGE_BASELINE_SAMPLE = max(1, int(os.getenv("IMAGE_BASELINE_SAMPLE", "20")))
+
+MAX_SKEW_DEGREES = 10.0
+TRIM_PADDING = 12
+# Width pages are normalized to before fingerprinting
+NORMALIZED_WIDTH = 512
+# Pages whose few most common tones cover this share of pixels (digital text,
+# screenshots, line art) are also tried as lossless PNG, which beats JPEG there
+FEW_TONES = 8
+FEW_TONES_SHARE = 0.75
+
+_totals = {"images": 0, "raw_bytes": 0, "sent_bytes": 0}
+_baseline = {"images": 0, "pixels": 0, "bytes": 0}  # measured PNG baselines
+_lock = threading.Lock()
+
+
+def downscale(arr: np.ndarray, max_pixels: int) -> np.ndarray:
+    h, w = arr.shape[:2]
+    if h * w <= max_pixels:
+        return arr
+    scale = (max_pixels / float(h * w)) ** 0.5
+    return cv2.resize(arr, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _ink_mask(gray: np.ndarray) -> np.ndarray:
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+
+def deskew(arr: np.ndarray) -> np.ndarray:
+    """
+    Straightens a scanned page using the minimum-area rectangle around its ink.
+    Angles beyond MAX_SKEW_DEGREES are treated as layout, not skew, and ignored.
+    """
+    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+    coords = cv2.findNonZero(_ink_mask(gray))
+    if coords is None:
+        return arr
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.3 or abs(angle) > MAX_SKEW_DEGREES:
+        return arr
+    h, w = arr.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(arr, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def trim_whitespace(arr: np.ndarray, padding: int = TRIM_PADDING) -> np.ndarray:
+    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+    coords = cv2.findNonZero(_ink_mask(gray))
+    if coords is None:
+        return arr
+    x, y, w, h = cv2.boundingRect(coords)
+    H, W = arr.shape[:2]
+    return arr[max(0, y - padding) : min(H, y + h + padding), max(0, x - padding) : min(W, x + w + padding)]
+
+
+def few_tones(gray: np.ndarray) -> bool:
+    hist = np.bincount(gray.ravel(), minlength=256)
+    return np.sort(hist)[-FEW_TONES:].sum() >= FEW_TONES_SHARE * gray.size
+
+
+def sdk_payload_bytes(img: Image.Image) -> tuple:
+    """
+    Size of the blob the google-genai SDK uploads for a PIL image passed
+    as-is, the baseline savings are measured against; returns (bytes,
+    measured). An image opened from a JPEG file is re-encoded at its own
+    quality, so the file size stands in for it. Otherwise the SDK sends a
+    PNG: one in IMAGE_BASELINE_SAMPLE images is encoded to measure it and
+    the rest are estimated at the bytes per pixel seen so far.
+    """
+    filename = getattr(img, "filename", "")
+    if img.format == "JPEG" and filename and img.mode in ("1", "L", "RGB", "RGBX", "CMYK"):
+        try:
+            return os.path.getsize(filename), False
+        except OSError:
+            pass
+    pixels = img.width * img.height
+    with _lock:
+        measure = _baseline["images"] % IMAGE_BASELINE_SAMPLE == 0 or not _baseline["pixels"]
+        _baseline["images"] += 1
+        if not measure:
+            return int(pixels * _baseline["bytes"] / _baseline["pixels"]), False
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    size = len(buf.getvalue())
+    with _lock:
+        _baseline["pixels"] += pixels
+        _baseline["bytes"] += size
+    return size, True
+
+
+def encode(arr: np.ndarray, fmt: str, quality: int) -> tuple:
+    """
+    Encodes as `fmt`, or as lossless PNG when that is smaller for a page of
+    few tones; returns (data, format).
+    """
+    buf = io.BytesIO()
+    img = Image.fromarray(arr)
+    img.save(buf, format=fmt, quality=quality, optimize=fmt == "JPEG")
+    data = buf.getvalue()
+    if few_tones(arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)):
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        if buf.tell() < len(data):
+            return buf.getvalue(), "PNG"
+    return data, fmt
+
+
+def prepare_image(
+    img: Image.Image,
+    grayscale: bool = IMAGE_GRAYSCALE,
+    straighten: bool = True,
+    trim: bool = True,
+    max_pixels: int = IMAGE_MAX_PIXELS,
+    fmt: str = IMAGE_FORMAT,
+    quality: int = IMAGE_QUALITY,
+) -> tuple:
+    """
+    Shrinks an image for a vision-model call. Returns (data, mime_type, stats)
+    where stats compares what the SDK would have uploaded for the original
+    image (raw_bytes, see sdk_payload_bytes) with the encoded payload.
+    """
+    raw_bytes, measured = sdk_payload_bytes(img)
+
+    arr = np.array(img.convert("L" if grayscale else "RGB"))
+    arr = downscale(arr, max_pixels)
+    if straighten:
+        arr = deskew(arr)
+    if trim:
+        arr = trim_whitespace(arr)
+
+    data, fmt = encode(arr, fmt, quality)
+
+    stats = {
+        "raw_bytes": raw_bytes,
+        "raw_measured": measured,
+        "sent_bytes": len(data),
+        "saved_bytes": raw_bytes - len(data),
+        "size": [arr.shape[1], arr.shape[0]],
+        "format": fmt,
+    }
+    with _lock:
+        _totals["images"] += 1
+        _totals["raw_bytes"] += raw_bytes
+        _totals["sent_bytes"] += len(data)
+    logger.info(f"image_prep: {img.width}x{img.height} -> {arr.shape[1]}x{arr.shape[0]} {fmt}, sent {len(data)} bytes, saved {stats['saved_bytes']}")
+    return data, f"image/{fmt.lower()}", stats
+
+
+def fingerprint(img: Image.Image) -> dict:
+    """
+    Content hash of the page normalized to a fixed-width grayscale image, so
+    the same page rendered at a different size or colour mode still matches.
+    Rescans deliberately do not: pages sharing a layout (exam sheets, forms)
+    look alike to any hash loose enough to match a rescan.
+    """
+    gray = np.array(img.convert("L"))
+    h, w = gray.shape
+    norm = cv2.resize(gray, (NORMALIZED_WIDTH, max(1, round(h * NORMALIZED_WIDTH / w))), interpolation=cv2.INTER_AREA)
+    # coarse quantisation absorbs resampling noise
+    digest = hashlib.sha256(norm.shape[0].to_bytes(4, "big") + (norm >> 4).tobytes()).hexdigest()
+    return {"sha": digest}
+
+
+def to_part(img: Image.Image, **kwargs) -> tuple:
+    """
+    prepare_image wrapped as a Gemini content part: returns (part, stats).
+    """
+    data, mime_type, stats = prepare_image(img, **kwargs)
+    return types.Part.from_bytes(data=data, mime_type=mime_type), stats
+
+
+def stats() -> dict:
+    with _lock:
+        totals = dict(_totals)
+    totals["saved_bytes"] = totals["raw_bytes"] - totals["sent_bytes"]
+    return totals
@@ -0,0 +1,37 @@
+# job_owner.py
+
+import os
+import socket
+from typing import Optional
+
+# Queued/running jobs of another host are presumed dead after this long
+# without progress (a process on this host is checked directly)
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "3600"))
+
+HOST = socket.gethostname()
+
+
+def current() -> dict:
+    # stored with a background job so any process can tell if it still runs
+    return {"host": HOST, "pid": os.getpid()}
+
+
+def orphaned(owner: Optional[dict], idle_seconds: float, live: bool = False) -> bool:
+    """
+    True if a queued or running job can no longer finish: its process is
+    gone (restart, crash, redeploy). `live` says whether this process holds
+    the job's task; `idle_seconds` is the time since its last progress.
+    """
+    if not owner:
+        return True  # written before owners were recorded, so by an earlier process
+    if owner.get("host") != HOST:
+        return idle_seconds > JOB_STALE_SECONDS
+    if owner.get("pid") == os.getpid():
+        return not live  # this process, or an earlier one that had the same pid
+    try:
+        os.kill(owner["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # exists, owned by another user
+    return False
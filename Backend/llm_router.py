@@ -1,20 +1,16 @@
 # llm_router.py
 
 import os
+import time
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from langchain_groq import ChatGroq
+import model_registry
+from campus_context import campus_context
+from semantic_cache import semantic_cache
 
 router = APIRouter()
 
-# Load context once at startup
-_context_path = 'output.txt'
-if os.path.exists(_context_path):
-    with open(_context_path, 'r', encoding='utf-8') as f:
-        data = f.read()
-else:
-    data = ""
-
 def get_llm():
     """
     Returns the language model instance (LLM) using ChatGroq API.
@@ -23,12 +19,7 @@ def get_llm():
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise RuntimeError("Environment variable GROQ_API_KEY is not set")
-    return ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0,
-        max_tokens=1024,
-        api_key=api_key
-    )
+    return model_registry.chat_groq(api_key)
 
 llm = get_llm()
 
@@ -37,14 +28,52 @@ class QueryRequest(BaseModel):
 
 @router.post("/ask")
 async def ask_query(request: QueryRequest):
+    start = time.perf_counter()
+    # answers stored against an older output.txt are dropped before lookup
+    await asyncio.to_thread(campus_context.refresh)
+    semantic_cache.validate(campus_context.fingerprint, model_registry.EMBEDDING_MODEL)
+    hit = semantic_cache.lookup_exact(request.query)
+    vector = None
+    if hit is None:
+        vector = await model_registry.embeddings().aembed_query(request.query)
+        hit = semantic_cache.lookup(vector, request.query, campus_context.entities)
+    if hit is not None:
+        return {
+            "response": hit["answer"],
+            "cached": True,
+            "similarity": hit["similarity"],
+            "cached_query": hit["query"],
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    # only the passages relevant to the question, not the whole campus scrape
+    passages = await campus_context.retrieve(request.query, vector)
+    context = "\n\n".join(passages)
     prompt = f"""You are EduLearnAI. A useful Assistant which helps people answer queries related to the Comsats University Islamabad Attock campus.
 Using the provided context. If you don't know the answer, just say you don't know—don't hallucinate.
 context:
-{data}
+{context}
 
 question: {request.query}
 
 answer:
 """
-    ans = llm.invoke(prompt)
-    return {"response": ans.content}
+    ans = await llm.ainvoke(prompt)
+    usage = campus_context.record(context)
+    usage["prompt_tokens"] = (getattr(ans, "usage_metadata", None) or {}).get("input_tokens")
+    semantic_cache.put(request.query, vector, ans.content)
+    await semantic_cache.save()
+    return {
+        "response": ans.content,
+        "cached": False,
+        "usage": usage,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+    }
+
+@router.get("/context/stats")
+async def context_stats():
+    return campus_context.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return semantic_cache.stats()
@@ -1,4 +1,6 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes import router as trainer_router
 from auth import router as auth_router
@@ -10,12 +12,27 @@ from chat import router as chat_router
 from check import router as check_router  
 from noRag import router as norag_router
 from llm_router import router as llm_router
+from uploads import BodySizeLimit
+import model_registry
+from campus_context import campus_context
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load models and build the campus index before the first request
+    await asyncio.to_thread(model_registry.warm_up)
+    await asyncio.to_thread(campus_context.refresh)
+    yield
 
 
 app = FastAPI(
-    title="EduLearnAI API"
+    title="EduLearnAI API",
+    lifespan=lifespan,
 )
 
+# Cut off request bodies over their route's cap while they stream in
+app.add_middleware(BodySizeLimit)
+
 # Include our chat routes
 app.include_router(chat_router)
 app.include_router(contact_router)  
@@ -33,6 +50,10 @@ app.include_router(norag_router)
 async def root():
     return {"status": "ok", "message": "EduLearnAI is running!"}
 
+@app.get("/models/stats", summary="Load time and memory of the shared models")
+async def model_stats():
+    return model_registry.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,138 @@
+# model_registry.py
+
+import os
+import time
+import logging
+import resource
+import threading
+from typing import Callable, Dict, Tuple
+from google import genai
+from groq import AsyncGroq, Groq
+from langchain_groq import ChatGroq
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from embedding_service import BatchingEmbeddings
+
+logger = logging.getLogger("uvicorn")
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "llama-3.3-70b-versatile")
+
+_instances: Dict[Tuple, dict] = {}
+_locks: Dict[Tuple, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _rss_bytes() -> int:
+    # current resident set size; peak RSS where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _get(key: Tuple, label: str, factory: Callable):
+    """
+    Returns the one shared instance for `key`, building it on first use.
+    Concurrent first callers wait for a single load instead of each loading.
+    """
+    entry = _instances.get(key)
+    if entry is None:
+        with _registry_lock:
+            lock = _locks.setdefault(key, threading.Lock())
+        with lock:
+            entry = _instances.get(key)
+            if entry is None:
+                rss, start = _rss_bytes(), time.perf_counter()
+                instance = factory()
+                entry = {
+                    "label": label,
+                    "instance": instance,
+                    "load_seconds": time.perf_counter() - start,
+                    "memory_bytes": max(0, _rss_bytes() - rss),
+                    "loaded_at": time.time(),
+                    "uses": 0,
+                }
+                _instances[key] = entry
+                logger.info(f"Loaded {label} in {entry['load_seconds']:.2f}s")
+    entry["uses"] += 1
+    return entry["instance"]
+
+
+def _require(api_key: str, name: str) -> str:
+    if not api_key:
+        raise ValueError(f"{name} is not set")
+    return api_key
+
+
+# ——— Models ——————————————————————————————————————————————————
+
+def embeddings(model_name: str = EMBEDDING_MODEL) -> CachedEmbeddings:
+    # chunks seen before come from the vector cache (see embedding_cache); the
+    # rest share micro-batched model calls (see embedding_service)
+    return _get(
+        ("embeddings", model_name),
+        f"embeddings:{model_name}",
+        lambda: CachedEmbeddings(
+            BatchingEmbeddings(
+                HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    model_kwargs={"device": "cpu"},
+                    encode_kwargs={"normalize_embeddings": True},
+                )
+            ),
+            EmbeddingCache(model_name),
+        ),
+    )
+
+
+def chat_groq(api_key: str, model: str = CHAT_MODEL, temperature: float = 0, max_tokens: int = 1024) -> ChatGroq:
+    _require(api_key, "Groq API key")
+    return _get(
+        ("chat_groq", api_key, model, temperature, max_tokens),
+        f"chat_groq:{model}",
+        lambda: ChatGroq(model=model, temperature=temperature, max_tokens=max_tokens, api_key=api_key),
+    )
+
+
+def groq_client(api_key: str) -> Groq:
+    _require(api_key, "Groq API key")
+    return _get(("groq", api_key), "groq", lambda: Groq(api_key=api_key))
+
+
+def async_groq_client(api_key: str) -> AsyncGroq:
+    _require(api_key, "Groq API key")
+    return _get(("async_groq", api_key), "async_groq", lambda: AsyncGroq(api_key=api_key))
+
+
+def genai_client(api_key: str) -> genai.Client:
+    _require(api_key, "Gemini API key")
+    return _get(("genai", api_key), "genai", lambda: genai.Client(api_key=api_key))
+
+
+# ——— Startup & stats —————————————————————————————————————————
+
+def warm_up():
+    """
+    Loads the embedding model and runs one embedding so the first request
+    does not pay for weight loading or lazy initialisation.
+    """
+    start = time.perf_counter()
+    embeddings().embed_query("warm up")
+    logger.info(f"Model registry warm in {time.perf_counter() - start:.2f}s")
+
+
+def stats() -> dict:
+    # api keys are part of the cache keys but never reported
+    return {
+        "rss_bytes": _rss_bytes(),
+        "models": [
+            {
+                **{k: v for k, v in entry.items() if k != "instance"},
+                **(entry["instance"].stats() if isinstance(entry["instance"], CachedEmbeddings) else {}),
+            }
+            for entry in sorted(_instances.values(), key=lambda e: e["loaded_at"])
+        ],
+    }
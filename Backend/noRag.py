@@ -3,14 +3,14 @@
 import uuid
 from fastapi import APIRouter
 from pydantic import BaseModel
-from groq import Groq
+import model_registry
 from pymongo import MongoClient
 from config import CONNECTION_STRING, CHATGROQ_API_KEY, CUSTOM_PROMPT
 
 router = APIRouter(prefix="/norag", tags=["noRag"])
 
 # clients
-client = Groq(api_key=CHATGROQ_API_KEY)
+client = model_registry.groq_client(CHATGROQ_API_KEY)
 mongo = MongoClient(CONNECTION_STRING)
 db = mongo["edulearnai"]
 chats = db["chats"]
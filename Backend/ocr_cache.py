@@ -0,0 +1,45 @@
+# ocr_cache.py
+
+import os
+import asyncio
+from typing import Callable, Optional
+
+from cache_store import MongoCache
+from image_prep import fingerprint  # re-exported; lives there so worker processes need no Mongo
+
+# Bump when prompts or the vision model change so stale text is not reused
+OCR_CACHE_VERSION = os.getenv("OCR_CACHE_VERSION", "gemini-2.0-flash:1")
+
+ocr_cache = MongoCache(
+    "ocr_text",
+    ttl_seconds=int(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600))),
+    max_entries=int(os.getenv("OCR_CACHE_SIZE", "20000")),
+)
+
+
+def lookup(kind: str, fp: dict) -> Optional[str]:
+    return ocr_cache.get(f"{OCR_CACHE_VERSION}:{kind}:{fp['sha']}")
+
+
+def store(kind: str, fp: dict, text: str):
+    ocr_cache.set(f"{OCR_CACHE_VERSION}:{kind}:{fp['sha']}", text)
+
+
+async def cached(kind: str, fp: Optional[dict], call: Callable, *args, accept: Callable = None) -> tuple:
+    """
+    Returns (text, hit): the cached text for fp, or the result of awaiting
+    call(*args), which is stored when accept(text) allows it.
+    """
+    if fp is None:
+        return await call(*args), False
+    text = await asyncio.to_thread(lookup, kind, fp)
+    if text is not None:
+        return text, True
+    text = await call(*args)
+    if text is not None and (accept is None or accept(text)):
+        await asyncio.to_thread(store, kind, fp, text)
+    return text, False
+
+
+def stats() -> dict:
+    return ocr_cache.stats()
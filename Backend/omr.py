@@ -0,0 +1,106 @@
+# omr.py
+
+import os
+from typing import Optional, Tuple
+import numpy as np
+import cv2
+from PIL import Image
+
+# ——— Sheet layout ——————————————————————————————————————————
+# The answer grid is read as `OMR_GRID_COLUMNS` blocks of questions laid out
+# top-to-bottom, each row being `OMR_LABEL_CELLS` number cells followed by one
+# cell per choice. Questions are numbered down each block, left to right.
+OMR_QUESTIONS = int(os.getenv("OMR_QUESTIONS", "15"))
+OMR_CHOICES = os.getenv("OMR_CHOICES", "ABCDE")
+OMR_GRID_COLUMNS = int(os.getenv("OMR_GRID_COLUMNS", "1"))
+OMR_LABEL_CELLS = int(os.getenv("OMR_LABEL_CELLS", "1"))
+
+# A bubble counts as filled when its share of dark pixels exceeds the row's
+# typical (empty) bubble by at least this much
+OMR_FILL_THRESHOLD = float(os.getenv("OMR_FILL_THRESHOLD", "0.25"))
+# Pages read below this confidence are handed back to the LLM
+OMR_MIN_CONFIDENCE = float(os.getenv("OMR_MIN_CONFIDENCE", "0.6"))
+
+CELL = 32  # pixels per cell after the grid is warped flat
+MARGIN = 6  # cell border ignored when measuring fill (grid lines, bubble outline)
+
+
+def _order_corners(pts: np.ndarray) -> np.ndarray:
+    # top-left, top-right, bottom-right, bottom-left
+    s = pts.sum(axis=1)
+    d = np.diff(pts, axis=1).ravel()
+    return np.array([pts[s.argmin()], pts[d.argmin()], pts[s.argmax()], pts[d.argmax()]], dtype="float32")
+
+
+def find_answer_grid(binary: np.ndarray, min_area: float = 0.1) -> Optional[np.ndarray]:
+    """
+    Locates the largest quadrilateral on the page (the answer grid border)
+    and returns it warped to an upright rectangle, or None if there is none.
+    """
+    h, w = binary.shape[:2]
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for cnt in sorted(contours, key=cv2.contourArea, reverse=True):
+        if cv2.contourArea(cnt) < min_area * h * w:
+            break
+        approx = cv2.approxPolyDP(cnt, 0.02 * cv2.arcLength(cnt, True), True)
+        if len(approx) != 4:
+            continue
+        src = _order_corners(approx.reshape(4, 2).astype("float32"))
+        gw = int(max(np.linalg.norm(src[1] - src[0]), np.linalg.norm(src[2] - src[3])))
+        gh = int(max(np.linalg.norm(src[3] - src[0]), np.linalg.norm(src[2] - src[1])))
+        dst = np.array([[0, 0], [gw - 1, 0], [gw - 1, gh - 1], [0, gh - 1]], dtype="float32")
+        return cv2.warpPerspective(binary, cv2.getPerspectiveTransform(src, dst), (gw, gh))
+    return None
+
+
+def bubble_fill_ratios(grid: np.ndarray, rows: int, columns: int, choices: int, label_cells: int) -> np.ndarray:
+    """
+    Returns a (questions, choices) matrix with the share of dark pixels inside
+    every bubble, measured in one pass over the warped binary grid.
+    """
+    cells = label_cells + choices
+    flat = cv2.resize(grid, (columns * cells * CELL, rows * CELL), interpolation=cv2.INTER_AREA)
+    blocks = (flat > 127).reshape(rows, CELL, columns, cells, CELL)
+    inner = blocks[:, MARGIN : CELL - MARGIN, :, label_cells:, MARGIN : CELL - MARGIN]
+    fill = inner.mean(axis=(1, 4))  # (rows, columns, choices)
+    # number questions down each block, then across blocks
+    return fill.transpose(1, 0, 2).reshape(rows * columns, choices)
+
+
+def read_answers(
+    page: Image.Image,
+    questions: int = OMR_QUESTIONS,
+    choices: str = OMR_CHOICES,
+    columns: int = OMR_GRID_COLUMNS,
+) -> Tuple[Optional[dict], float]:
+    """
+    Reads the answer grid locally. Returns the answers in the same
+    {"Answers": {"1": ..., ...}} shape as parse_all_answers together with a
+    confidence in [0, 1]; answers are None when no grid could be found.
+    """
+    gray = cv2.cvtColor(np.array(page.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+    grid = find_answer_grid(binary)
+    if grid is None:
+        return None, 0.0
+
+    rows = -(-questions // columns)
+    fill = bubble_fill_ratios(grid, rows, columns, len(choices), OMR_LABEL_CELLS)[:questions]
+
+    # ink above the row's empty-bubble baseline (outline, paper noise)
+    ink = fill - np.median(fill, axis=1, keepdims=True)
+    order = np.argsort(ink, axis=1)
+    best = ink[np.arange(questions), order[:, -1]]
+    second = ink[np.arange(questions), order[:, -2]] if len(choices) > 1 else np.zeros(questions)
+    marked = best >= OMR_FILL_THRESHOLD
+
+    # A question is clear-cut when one bubble stands out from the rest, or
+    # when every bubble stays well below the threshold (left blank).
+    margin = np.where(marked, (best - second) / np.maximum(best, 1e-6), 1.0 - best / OMR_FILL_THRESHOLD)
+    confidence = float(np.clip(margin, 0.0, 1.0).min()) if questions else 0.0
+
+    letters = [choices[i] for i in order[:, -1]]
+    answers = {str(q): (letters[i] if marked[i] else "") for i, q in enumerate(range(1, questions + 1))}
+    return {"Answers": answers}, confidence
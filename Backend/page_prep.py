@@ -0,0 +1,68 @@
+# page_prep.py
+"""
+CPU-only half of grading an answer sheet. Nothing here touches the network
+or needs an API key on import, so grade_cli's worker processes can import it.
+"""
+
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+import cv2
+from PIL import Image
+
+import omr
+from image_prep import fingerprint, to_part
+from pdf_utils import iter_pages
+
+# "llm" sends every answer grid to Gemini, "omr" reads bubbles locally and
+# only falls back to Gemini for low-confidence pages
+GRADING_MODE = os.getenv("GRADING_MODE", "llm")
+
+
+def crop_candidate_info(page: Image.Image) -> Optional[Image.Image]:
+    cv = cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR)
+    h, w = cv.shape[:2]
+    mask = np.zeros((h, w), dtype="uint8")
+    top, bottom = int(h * 0.10), int(h * 0.75)
+    cv2.rectangle(mask, (0, top), (w, h - bottom), 255, -1)
+    crop = cv2.bitwise_and(cv, cv, mask=mask)
+    coords = cv2.findNonZero(mask)
+    if coords is None:
+        return None
+    x, y, mw, mh = cv2.boundingRect(coords)
+    return Image.fromarray(cv2.cvtColor(crop[y : y + mh, x : x + mw], cv2.COLOR_BGR2RGB))
+
+
+def prepare_page(page: Image.Image, mode: str = GRADING_MODE) -> Optional[dict]:
+    """
+    Crops and encodes the images the model calls need and, in omr mode,
+    reads the bubbles locally. The result is picklable so it can be built
+    in a worker process.
+    """
+    # crop candidate-info
+    cand_img = crop_candidate_info(page)
+    if cand_img is None:
+        return None
+
+    # fingerprints key the OCR cache so re-uploaded sheets skip the model
+    info_part, info_stats = to_part(cand_img)
+    prepared = {
+        "info": info_part,
+        "omr": None,
+        "answers": None,
+        "fp": {"info": fingerprint(cand_img)},
+        "stats": {"info": info_stats},
+    }
+    if mode == "omr":
+        answers, confidence = omr.read_answers(page)
+        if answers is not None and confidence >= omr.OMR_MIN_CONFIDENCE:
+            prepared["omr"] = answers
+    if prepared["omr"] is None:
+        prepared["answers"], prepared["stats"]["answers"] = to_part(page)
+        prepared["fp"]["answers"] = fingerprint(page)
+    return prepared
+
+
+def prepare_pdf(path: str, dpi: int, mode: str) -> List[Tuple[int, Optional[dict]]]:
+    # rasterize every page and prepare it; run in a worker process by grade_cli
+    return [(number, prepare_page(page, mode)) for number, page in iter_pages(path, dpi=dpi)]
@@ -0,0 +1,137 @@
+# pdf_utils.py
+
+import os
+import asyncio
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+# Rasterization defaults, overridable per call
+PDF_DPI = int(os.getenv("PDF_DPI", "200"))
+# pdftoppm processes run side by side; also the number of pages held at once
+PDF_THREAD_COUNT = int(os.getenv("PDF_THREAD_COUNT", "1"))
+# Pages with fewer letters/digits than this in their text layer are treated as scans
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "40"))
+
+PdfSource = Union[bytes, str]
+
+
+@contextmanager
+def pdf_path(pdf: PdfSource) -> Iterator[str]:
+    """
+    Yields a filesystem path for the PDF. Bytes are written to a temp file once
+    so poppler can re-open it for every page instead of re-copying the upload.
+    """
+    if isinstance(pdf, str):
+        yield pdf
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def page_count(pdf: PdfSource) -> int:
+    with pdf_path(pdf) as path:
+        return int(pdfinfo_from_path(path)["Pages"])
+
+
+def _runs(numbers: List[int], size: int) -> Iterator[Tuple[int, int]]:
+    # consecutive page numbers grouped into (first, last) runs of at most `size`
+    start = prev = None
+    for n in numbers:
+        if start is not None and n == prev + 1 and n - start < size:
+            prev = n
+            continue
+        if start is not None:
+            yield start, prev
+        start = prev = n
+    if start is not None:
+        yield start, prev
+
+
+def iter_pages(
+    pdf: PdfSource,
+    dpi: int = PDF_DPI,
+    grayscale: bool = False,
+    thread_count: int = PDF_THREAD_COUNT,
+    first_page: int = 1,
+    last_page: int = None,
+    numbers: Optional[Iterable[int]] = None,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Yields (page_number, image) one page at a time, for the first_page..last_page
+    range or just the given page numbers. At most `thread_count` pages are
+    decoded together, so memory stays flat whatever the page count.
+    """
+    thread_count = max(1, thread_count)
+    with pdf_path(pdf) as path:
+        total = int(pdfinfo_from_path(path)["Pages"])
+        if numbers is None:
+            numbers = range(first_page, min(last_page or total, total) + 1)
+        for start, end in _runs(sorted(n for n in numbers if 1 <= n <= total), thread_count):
+            images = convert_from_path(
+                path,
+                dpi=dpi,
+                first_page=start,
+                last_page=end,
+                grayscale=grayscale,
+                thread_count=thread_count,
+            )
+            for number in range(start, end + 1):
+                # hand over ownership so the caller's reference is the only one
+                yield number, images[number - start]
+                images[number - start] = None
+
+
+def page_texts(pdf: PdfSource) -> List[str]:
+    """
+    Embedded text of every page via poppler's pdftotext (one call for the
+    whole document). Scanned pages come back empty or nearly so.
+    """
+    with pdf_path(pdf) as path:
+        out = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", path, "-"],
+            capture_output=True,
+            check=True,
+        ).stdout.decode("utf-8", errors="replace")
+    # pages are separated by form feeds, with one trailing after the last page
+    pages = out.split("\f")
+    return pages[:-1] if len(pages) > 1 and not pages[-1].strip() else pages
+
+
+def has_text_layer(text: str, min_chars: int = TEXT_LAYER_MIN_CHARS) -> bool:
+    return sum(1 for c in text if c.isalnum()) >= min_chars
+
+
+def render_page(pdf: PdfSource, number: int = -1, dpi: int = PDF_DPI, grayscale: bool = False) -> Image.Image:
+    """
+    Renders a single page; negative numbers count from the end like list indexes.
+    """
+    with pdf_path(pdf) as path:
+        if number < 0:
+            number += int(pdfinfo_from_path(path)["Pages"]) + 1
+        return convert_from_path(path, dpi=dpi, first_page=number, last_page=number, grayscale=grayscale)[0]
+
+
+async def aiter_pages(pdf: PdfSource, **kwargs) -> AsyncIterator[Tuple[int, Image.Image]]:
+    """
+    Async version of iter_pages: every page is decoded in a worker thread so the
+    event loop keeps serving requests, and callers can start on page 1 right away.
+    """
+    pages = iter_pages(pdf, **kwargs)
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, pages, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        pages.close()
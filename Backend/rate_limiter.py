@@ -0,0 +1,83 @@
+# rate_limiter.py
+
+import os
+import time
+import random
+import asyncio
+
+# Process-wide budget for Gemini requests
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "120"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+RETRY_STATUS = (429, 500, 503)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket for coroutines on one event loop. Callers take a token
+    immediately (the balance may go negative) and then sleep off their share
+    of the debt, so waiting never blocks the loop and needs no lock.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self, tokens: float = 1.0):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+gemini_limiter = AsyncTokenBucket(GEMINI_REQUESTS_PER_MINUTE / 60.0, GEMINI_BURST)
+
+
+def backoff_delay(attempt: int) -> float:
+    # exponential backoff with +/-50% jitter so retries from parallel pages spread out
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+async def gemini_generate(client, max_retries: int = GEMINI_MAX_RETRIES, **kwargs):
+    """
+    client.aio.models.generate_content behind the shared limiter. Rate-limit
+    and transient server errors are retried with jittered backoff; anything
+    else (or the last failure) is raised to the caller.
+    """
+    for attempt in range(max_retries):
+        await gemini_limiter.acquire()
+        try:
+            return await client.aio.models.generate_content(**kwargs)
+        except Exception as e:
+            code = getattr(e, "code", None)
+            if code not in RETRY_STATUS or attempt == max_retries - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+
+
+async def gemini_generate_stream(client, max_retries: int = GEMINI_MAX_RETRIES, **kwargs):
+    """
+    client.aio.models.generate_content_stream behind the same limiter,
+    yielding response chunks. Failures are retried as in gemini_generate,
+    but only before the first chunk: a stream that breaks midway is raised.
+    """
+    for attempt in range(max_retries):
+        await gemini_limiter.acquire()
+        started = False
+        try:
+            async for chunk in await client.aio.models.generate_content_stream(**kwargs):
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            code = getattr(e, "code", None)
+            if started or code not in RETRY_STATUS or attempt == max_retries - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
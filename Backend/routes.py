@@ -1,6 +1,5 @@
 import os
 import shutil
-import tempfile
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
 from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
@@ -8,6 +7,7 @@ from models import InitializeBotResponse, NewChatResponse, QueryRequest, QueryRe
 from trainer_manager import get_trainer
 from config import CUSTOM_PROMPT
 from prompt_templates import PromptTemplates
+from uploads import MAX_DOCUMENT_BYTES, max_body, spooled
 
 router = APIRouter()
 trainer = get_trainer()
@@ -27,23 +27,19 @@ def initialize_bot(prompt_type: str = Query(None)):
 
 
 @router.post("/upload_document")
+@max_body(MAX_DOCUMENT_BYTES)
 async def upload_document(bot_id: str = Form(...), file: UploadFile = File(...)):
     """
     Saves the uploaded file temporarily and adds it to the specified bot's knowledge base.
     """
     try:
-        # Save the file to a temporary location.
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp_path = tmp.name
-
-        # Add the document using the temporary file path to the specified bot.
-        trainer.add_document_from_path(tmp_path, bot_id)
-
-        # Remove the temporary file.
-        os.remove(tmp_path)
+        # Spool the file to a temporary location (removed afterwards).
+        async with spooled(file, MAX_DOCUMENT_BYTES) as tmp_path:
+            # Add the document using the temporary file path to the specified bot.
+            trainer.add_document_from_path(tmp_path, bot_id)
         return {"message": "Document uploaded and added successfully."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,355 @@
+# semantic_cache.py
+
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+import faiss
+import numpy as np
+
+from data_dir import DATA_DIR
+
+# Cosine similarity above which a stored answer is reused for a new question.
+# Questions that differ only in a program, department or code are told apart
+# by same_subject(), so this only has to separate different questions about
+# the same thing; check it against CALIBRATION_PAIRS with `python semantic_cache.py`.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", os.path.join(DATA_DIR, "semantic_cache"))
+
+INDEX_FILE = "index.faiss"
+ENTRIES_FILE = "entries.json"
+# neighbours checked per lookup, in case the nearest ones have expired
+SEARCH_K = 4
+
+_WORD = re.compile(r"[a-z0-9]+")
+# codes are short words with two or more capitals ("CS", "BSCS", "PEEF", "MPhil")
+_CODE = re.compile(r"\b[A-Za-z]{2,6}\b")
+_TITLE = r"[A-Z][a-z]+(?:\s+(?:and\s+|&\s+)?[A-Z][a-z]+)*"
+# "Department of Electrical and Computer Engineering", "BS (Computer Science)"
+_UNIT = re.compile(rf"\b(?:Department|Dept\.?|School|Faculty|Institute) of\s+({_TITLE})")
+_PROGRAM = re.compile(rf"\b(?:BS|MS|PhD|MPhil|BSc|MSc|Bachelors?|Masters?)\s*(?:in\s+|of\s+)?\(?({_TITLE})")
+# degree levels, however they are typed
+DEGREES = frozenset({"bs", "ms", "phd", "mphil", "bsc", "msc", "bba", "mba"})
+# words a matched name can be made of that do not name anything
+_GENERIC = frozenset({"program", "programme", "department", "degree", "course"})
+# answers the model gives when the context does not cover the question
+_UNKNOWN = re.compile(
+    r"\b(?:don['’]?t|do not|doesn['’]?t|does not) (?:know|have)\b|\bno information\b"
+    r"|\bnot (?:mentioned|available|provided|specified)\b",
+    re.I,
+)
+# question and filler words that do not change what is asked
+STOPWORDS = frozenset("""
+    a an the is are was were be been am do does did can could would should will
+    shall may might must what which who whom whose when where why how much many
+    i me my we our you your he she it its they them their this that these those
+    of for to in on at by with from about into as and or if then than there here
+    please tell know give let get any some all also just so kindly
+""".split())
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+
+def _stem(word: str) -> str:
+    # "fees" and "fee", "programs" and "program" ask the same thing
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")) else word
+
+
+def key_terms(text: str) -> frozenset:
+    """
+    Content words of a question, lowercased and singular.
+    """
+    return frozenset(_stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS)
+
+
+def codes(text: str) -> frozenset:
+    return frozenset(_stem(w.lower()) for w in _CODE.findall(text) if sum(c.isupper() for c in w) >= 2)
+
+
+def entity_terms(text: str) -> frozenset:
+    """
+    Program, department and code names in a document, as key terms: the
+    words of "Department of ..." and "BS ..." names, the initials of
+    multi-word ones alone and after BS/MS ("cs", "bscs"), and codes.
+    """
+    terms = set(codes(text))
+    for match in list(_UNIT.finditer(text)) + list(_PROGRAM.finditer(text)):
+        words = [w.lower() for w in re.findall(r"[A-Za-z]+", match.group(1)) if w.lower() not in STOPWORDS]
+        if all(_stem(w) in _GENERIC for w in words):
+            continue
+        terms.update(_stem(w) for w in words)
+        if len(words) > 1:
+            initials = "".join(w[0] for w in words)
+            terms.update({initials, "bs" + initials, "ms" + initials})
+    return frozenset(terms)
+
+
+def same_subject(query: str, cached: str, entities: frozenset = frozenset()) -> bool:
+    """
+    True unless the two questions differ in a name, code, degree or number:
+    embeddings place "fee for BSCS" and "fee for BBA" side by side. Names
+    are `entities` (see entity_terms) plus codes written in either question.
+    """
+    names = entities | DEGREES | codes(query) | codes(cached)
+    return not any(t in names or any(c.isdigit() for c in t) for t in key_terms(query) ^ key_terms(cached))
+
+
+def is_unknown(answer: str) -> bool:
+    return bool(_UNKNOWN.search(answer))
+
+
+class SemanticCache:
+    """
+    Answers keyed by question embedding. Lookups search an inner-product
+    index over unit vectors (cosine similarity; exact search is well under
+    a millisecond at this size and, unlike HNSW, supports removal) and a
+    question repeated verbatim skips the embedding. A neighbour is only
+    reused if it asks about the same names (same_subject), and "don't know"
+    answers are not stored, so a later context change can answer them. Entries expire
+    `ttl_seconds` after being stored and the least recently hit are evicted
+    past `max_entries`. Everything is tied to a context fingerprint and a
+    model: when either changes the cache empties. The index and entries are
+    saved to `root` after each change and loaded at startup; workers share
+    the directory and the last one to save wins.
+    """
+
+    def __init__(self, root: str = SEMANTIC_CACHE_DIR, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds: int = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_SIZE):
+        self.root = root
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.fingerprint = ""
+        self.model = ""
+        self.index = None
+        self.entries = OrderedDict()  # id -> entry, least recently hit first
+        self.exact = {}  # normalized question -> id
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self._write_lock = threading.Lock()
+        self._load()
+
+    # ——— Persistence ———————————————————————————————————————
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, ENTRIES_FILE), encoding="utf-8") as f:
+                state = json.load(f)
+            index = faiss.read_index(os.path.join(self.root, INDEX_FILE))
+        except (OSError, ValueError, RuntimeError):
+            return  # nothing saved yet, or a torn save; start empty
+        self.fingerprint = state["fingerprint"]
+        self.model = state["model"]
+        self.next_id = state["next_id"]
+        self.index = index
+        for entry in state["entries"]:
+            self.entries[entry["id"]] = entry
+            self.exact[_normalize(entry["query"])] = entry["id"]
+        self._expire()
+
+    def _snapshot(self):
+        state = {
+            "fingerprint": self.fingerprint,
+            "model": self.model,
+            "next_id": self.next_id,
+            "entries": list(self.entries.values()),
+        }
+        index = faiss.serialize_index(self.index) if self.index is not None else None
+        return json.dumps(state), index
+
+    def _write(self, state: str, index):
+        # write-then-rename; the entries go last since they are what _load() trusts
+        with self._write_lock:
+            os.makedirs(self.root, exist_ok=True)
+            index_path = os.path.join(self.root, INDEX_FILE)
+            if index is None:
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+            else:
+                tmp = f"{index_path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(index.tobytes())
+                os.replace(tmp, index_path)
+            entries_path = os.path.join(self.root, ENTRIES_FILE)
+            tmp = f"{entries_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(state)
+            os.replace(tmp, entries_path)
+
+    async def save(self):
+        # snapshot on the event loop, write to disk off it
+        await asyncio.to_thread(self._write, *self._snapshot())
+
+    # ——— Entries ———————————————————————————————————————————
+
+    def _remove(self, ids: List[int]):
+        for i in ids:
+            entry = self.entries.pop(i, None)
+            if entry and self.exact.get(_normalize(entry["query"])) == i:
+                del self.exact[_normalize(entry["query"])]
+        if ids and self.index is not None:
+            self.index.remove_ids(np.asarray(ids, dtype="int64"))
+
+    def _expire(self) -> int:
+        cutoff = time.time() - self.ttl
+        expired = [i for i, e in self.entries.items() if e["created_at"] < cutoff]
+        self._remove(expired)
+        return len(expired)
+
+    def clear(self):
+        self.entries.clear()
+        self.exact.clear()
+        self.index = None
+
+    def validate(self, fingerprint: str, model: str) -> bool:
+        """
+        Empties the cache if the context or embedding model changed since
+        its answers were stored; True if it did.
+        """
+        if fingerprint == self.fingerprint and model == self.model:
+            return False
+        self.clear()
+        self.fingerprint = fingerprint
+        self.model = model
+        return True
+
+    def _hit(self, entry_id: int, similarity: float) -> dict:
+        entry = self.entries[entry_id]
+        self.entries.move_to_end(entry_id)
+        self.hits += 1
+        return {"answer": entry["answer"], "query": entry["query"], "similarity": similarity}
+
+    def lookup_exact(self, query: str) -> Optional[dict]:
+        entry_id = self.exact.get(_normalize(query))
+        if entry_id is None or self.entries[entry_id]["created_at"] < time.time() - self.ttl:
+            return None
+        return self._hit(entry_id, 1.0)
+
+    def lookup(self, vector: List[float], query: str, entities: frozenset = frozenset()) -> Optional[dict]:
+        """
+        Nearest stored question above the threshold that asks about the same
+        names as `query`; `entities` are the context's names (entity_terms).
+        """
+        if self.index is None or self.index.ntotal == 0:
+            self.misses += 1
+            return None
+        cutoff = time.time() - self.ttl
+        scores, ids = self.index.search(np.asarray([vector], dtype="float32"), SEARCH_K)
+        for score, entry_id in zip(scores[0], ids[0]):
+            if entry_id < 0 or score < self.threshold:
+                break
+            entry = self.entries.get(int(entry_id))
+            if entry and entry["created_at"] >= cutoff and same_subject(query, entry["query"], entities):
+                return self._hit(int(entry_id), float(score))
+        self.misses += 1
+        return None
+
+    def put(self, query: str, vector: List[float], answer: str) -> bool:
+        """
+        Stores an answer; False if it was not cached because it is a "don't know".
+        """
+        if is_unknown(answer):
+            return False
+        self._expire()
+        vec = np.asarray([vector], dtype="float32")
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vec.shape[1]))
+        entry_id = self.next_id
+        self.next_id += 1
+        # a re-asked question replaces its old answer instead of sitting beside it
+        previous = self.exact.get(_normalize(query))
+        if previous is not None:
+            self._remove([previous])
+        self.index.add_with_ids(vec, np.asarray([entry_id], dtype="int64"))
+        self.entries[entry_id] = {"id": entry_id, "query": query, "answer": answer, "created_at": time.time()}
+        self.exact[_normalize(query)] = entry_id
+        if len(self.entries) > self.max_entries:
+            self._remove(list(self.entries)[: len(self.entries) - self.max_entries])
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fingerprint": self.fingerprint,
+        }
+
+
+# Campus questions that must not share an answer (False) or may (True)
+CALIBRATION_PAIRS: List[Tuple[str, str, bool]] = [
+    # told apart by same_subject()
+    ("What is the fee for BSCS?", "What is the fee for BBA?", False),
+    ("Who is the head of the CS department?", "Who is the head of the EE department?", False),
+    ("What is the merit for BS Computer Science?", "What is the merit for BS Electrical Engineering?", False),
+    ("When does admission open for MS programs?", "When does admission open for BS programs?", False),
+    ("What is the fee for semester 1?", "What is the fee for semester 2?", False),
+    ("What scholarships are offered under PEEF?", "What scholarships are offered under BEEF?", False),
+    # only the threshold tells these apart
+    ("What is the fee for BSCS?", "What is the merit for BSCS?", False),
+    ("When does admission open for MS programs?", "When does admission close for MS programs?", False),
+    ("Is hostel available for girls?", "Is hostel available for boys?", False),
+    ("How do I contact the SFAO office?", "How do I contact the admission office?", False),
+    ("Who is the campus director?", "Who is the campus registrar?", False),
+    ("Where is the library?", "Where is the cafeteria?", False),
+    # paraphrases
+    ("What is the fee for BSCS?", "How much are the BSCS fees?", True),
+    ("What is the fee for BSCS?", "How much does BSCS cost?", True),
+    ("Who is the head of the CS department?", "Who heads the CS department?", True),
+    ("Who is the director?", "Who is the campus director?", True),
+    ("Where is the campus located?", "What is the campus address?", True),
+    ("When does admission open for MS programs?", "When do MS admissions open?", True),
+    ("What scholarships are offered under PEEF?", "Which PEEF scholarships are offered?", True),
+    ("Is hostel available for girls?", "Do girls get a hostel?", True),
+]
+
+
+def calibrate(embed: Callable[[List[str]], List[List[float]]], entities: frozenset = frozenset(),
+              pairs: Iterable[Tuple[str, str, bool]] = CALIBRATION_PAIRS, margin: float = 0.01) -> dict:
+    """
+    Scores each pair with `embed` (unit vectors, like the embedding model's)
+    and suggests the threshold just above every pair that must not collide
+    and that same_subject() lets through. `paraphrases_reused` is the share
+    of same-answer pairs that would hit at the suggested and current ones.
+    """
+    pairs = list(pairs)
+    vectors = np.asarray(embed([q for a, b, _ in pairs for q in (a, b)]), dtype="float32")
+    scores = [float(s) for s in (vectors[0::2] * vectors[1::2]).sum(axis=1)]
+    different = [s for s, (a, b, same) in zip(scores, pairs) if not same and same_subject(a, b, entities)]
+    paraphrases = [(s, a, b) for s, (a, b, same) in zip(scores, pairs) if same]
+    threshold = min(1.0, max(different) + margin) if different else min(s for s, _, _ in paraphrases)
+
+    def reused(t):
+        return sum(1 for s, a, b in paraphrases if s >= t and same_subject(a, b, entities)) / len(paraphrases)
+
+    return {
+        "scores": [{"pair": [a, b], "same": same, "score": round(s, 4)} for s, (a, b, same) in zip(scores, pairs)],
+        "suggested_threshold": round(threshold, 4),
+        "paraphrases_reused": {"suggested": reused(threshold), "current": reused(SEMANTIC_CACHE_THRESHOLD)},
+    }
+
+
+semantic_cache = SemanticCache()
+
+
+if __name__ == "__main__":
+    import model_registry
+    from campus_context import campus_context
+
+    campus_context.refresh()
+    print(json.dumps(calibrate(model_registry.embeddings().embed_documents, campus_context.entities), indent=2))
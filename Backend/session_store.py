@@ -0,0 +1,234 @@
+# session_store.py
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from data_dir import DATA_DIR
+
+# Shared by every worker; each session is one directory under it
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join(DATA_DIR, "sessions"))
+# Indexes kept loaded per worker, by estimated size
+SESSION_MEMORY_BYTES = int(os.getenv("SESSION_MEMORY_BYTES", str(256 * 1024 * 1024)))
+# Sessions not queried for this long are deleted
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", str(24 * 3600)))
+SWEEP_INTERVAL = 600
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+HISTORY_FILE = "history.json"
+STATUS_FILE = "status.json"
+TOUCH_FILE = "last_used"
+
+
+def _write_json(path: str, data):
+    # write-then-rename so readers in other workers never see half a file
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class SessionStore:
+    """
+    Video RAG sessions on disk: a FAISS index, its chunks and the chat
+    history per session directory, so any worker can serve any session and
+    sessions survive restarts. An ingestion job reserve()s a session and
+    save()s its index as it grows. Indexes are memory-mapped on first query and
+    kept in an LRU bounded by `memory_bytes`; sessions idle for longer than
+    `idle_seconds` are removed by a sweep that runs at most every
+    SWEEP_INTERVAL seconds.
+    """
+
+    def __init__(self, root: str = SESSION_DIR, memory_bytes: int = SESSION_MEMORY_BYTES,
+                 idle_seconds: int = SESSION_IDLE_SECONDS):
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.idle_seconds = idle_seconds
+        self._loaded = OrderedDict()  # sid -> (vectorstore, size, index mtime)
+        self._used = 0
+        self._lock = threading.Lock()
+        self._swept = 0.0
+
+    def _dir(self, sid: str) -> str:
+        # session ids are uuids; anything else must not escape the root
+        return os.path.join(self.root, uuid.UUID(sid).hex)
+
+    def _names(self) -> List[str]:
+        try:
+            return os.listdir(self.root)
+        except FileNotFoundError:
+            return []  # created by the first reserve()
+
+    def exists(self, sid: str) -> bool:
+        try:
+            return os.path.exists(os.path.join(self._dir(sid), INDEX_FILE))
+        except ValueError:
+            return False
+
+    def touch(self, sid: str):
+        with open(os.path.join(self._dir(sid), TOUCH_FILE), "a"):
+            pass
+        os.utime(os.path.join(self._dir(sid), TOUCH_FILE))
+
+    # ——— Indexes ———————————————————————————————————————————
+
+    def reserve(self, **status) -> str:
+        """
+        Creates a session with an empty history and no index yet (load()
+        returns None until the first save()); `status` seeds its status.
+        """
+        sid = str(uuid.uuid4())
+        path = self._dir(sid)
+        os.makedirs(path)
+        _write_json(os.path.join(path, HISTORY_FILE), [])
+        _write_json(os.path.join(path, STATUS_FILE), status)
+        self.touch(sid)
+        self.sweep()
+        return sid
+
+    def save(self, sid: str, index: faiss.Index, chunks: List[str]):
+        """
+        Writes (or replaces) the session's FAISS index, whose vector i embeds
+        chunks[i]. Chunks go first and the index last, and load() reads them
+        in the opposite order, so a reader never gets vectors without text.
+        """
+        path = self._dir(sid)
+        _write_json(os.path.join(path, CHUNKS_FILE), chunks)
+        faiss.write_index(index, os.path.join(path, INDEX_FILE + ".tmp"))
+        os.replace(os.path.join(path, INDEX_FILE + ".tmp"), os.path.join(path, INDEX_FILE))
+        self.touch(sid)
+
+    def load(self, sid: str, embeddings) -> Optional[FAISS]:
+        """
+        The session's vector store, from the LRU or memory-mapped from disk;
+        None if the session does not exist (or expired).
+        """
+        self.sweep()
+        if not self.exists(sid):
+            self._drop(sid)
+            return None
+        self.touch(sid)
+        path = self._dir(sid)
+        # an index still being built is re-read whenever it has grown
+        mtime = os.path.getmtime(os.path.join(path, INDEX_FILE))
+        with self._lock:
+            if sid in self._loaded and self._loaded[sid][2] == mtime:
+                self._loaded.move_to_end(sid)
+                return self._loaded[sid][0]
+
+        index = faiss.read_index(os.path.join(path, INDEX_FILE), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(path, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks = json.load(f)
+        ids = [str(i) for i in range(index.ntotal)]
+        vs = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore({i: Document(page_content=c) for i, c in zip(ids, chunks)}),
+            index_to_docstore_id=dict(enumerate(ids)),
+        )
+        size = index.ntotal * index.d * 4 + sum(len(c) for c in chunks[: index.ntotal])
+
+        with self._lock:
+            previous = self._loaded.pop(sid, None)
+            if previous:
+                self._used -= previous[1]
+            self._loaded[sid] = (vs, size, mtime)
+            self._used += size
+            # always keep the session just loaded, even if it alone is over budget
+            while self._used > self.memory_bytes and len(self._loaded) > 1:
+                _, (_, evicted, _) = self._loaded.popitem(last=False)
+                self._used -= evicted
+            return self._loaded[sid][0]
+
+    def _drop(self, sid: str):
+        with self._lock:
+            entry = self._loaded.pop(sid, None)
+            if entry:
+                self._used -= entry[1]
+
+    # ——— Status ————————————————————————————————————————————
+
+    def status(self, sid: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._dir(sid), STATUS_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return None
+
+    def set_status(self, sid: str, **fields):
+        # only the session's ingestion job writes its status
+        status = self.status(sid) or {}
+        status.update(fields, updated_at=time.time())
+        _write_json(os.path.join(self._dir(sid), STATUS_FILE), status)
+
+    # ——— History ———————————————————————————————————————————
+
+    @contextmanager
+    def _history_lock(self, sid: str):
+        # serializes read-modify-write of one history across workers
+        with open(os.path.join(self._dir(sid), HISTORY_FILE + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def history(self, sid: str) -> list:
+        with open(os.path.join(self._dir(sid), HISTORY_FILE), encoding="utf-8") as f:
+            return [tuple(turn) for turn in json.load(f)]
+
+    def append_history(self, sid: str, question: str, answer: str):
+        with self._history_lock(sid):
+            turns = self.history(sid)
+            turns.append((question, answer))
+            _write_json(os.path.join(self._dir(sid), HISTORY_FILE), turns)
+
+    # ——— Expiry ————————————————————————————————————————————
+
+    def sweep(self, force: bool = False) -> int:
+        now = time.time()
+        if not force and now - self._swept < SWEEP_INTERVAL:
+            return 0
+        self._swept = now
+        removed = 0
+        for name in self._names():
+            try:
+                sid = str(uuid.UUID(hex=name))
+            except ValueError:
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                last_used = os.path.getmtime(os.path.join(path, TOUCH_FILE))
+            except OSError:
+                try:
+                    # half-created session; give its creator time to finish
+                    last_used = os.path.getmtime(path)
+                except OSError:
+                    continue  # removed by another worker's sweep
+            if now - last_used > self.idle_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                self._drop(sid)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions_on_disk": len(self._names()),
+                "sessions_loaded": len(self._loaded),
+                "loaded_bytes": self._used,
+                "memory_bytes": self.memory_bytes,
+                "idle_seconds": self.idle_seconds,
+            }
@@ -0,0 +1,131 @@
+# test_semantic_cache.py
+
+import numpy as np
+import pytest
+
+from semantic_cache import (
+    CALIBRATION_PAIRS, SEMANTIC_CACHE_THRESHOLD, SemanticCache, calibrate, entity_terms, same_subject,
+)
+
+CONTEXT = """
+Fee Structure for BS Computer Science (BSCS) and BBA programs.
+The Department of Electrical Engineering (EE) offers MS and BS degrees.
+Scholarships are offered under PEEF and BEEF.
+"""
+
+# questions about different programs, departments or numbers
+NEAR_MISSES = [
+    ("What is the fee for BSCS?", "What is the fee for BBA?"),
+    ("Who is the CS department head?", "Who is the EE department head?"),
+    ("What is the merit for Computer Science?", "What is the merit for Electrical Engineering?"),
+    ("What is the fee for semester 1?", "What is the fee for semester 2?"),
+    ("What scholarships are offered under PEEF?", "What scholarships are offered under BEEF?"),
+]
+
+PARAPHRASES = [
+    ("What is the fee for BSCS?", "How much are the BSCS fees?"),
+    ("What is the fee for BSCS?", "How much does BSCS cost?"),
+    ("Who is the CS department head?", "Who heads the CS department?"),
+    ("Who is the director?", "Who is the campus director?"),
+    ("Where is the campus located?", "What is the campus address?"),
+    ("Is hostel available for girls?", "Do girls get a hostel?"),
+]
+
+
+def unit(seed: int, dim: int = 16) -> np.ndarray:
+    v = np.random.default_rng(seed).normal(size=dim)
+    return v / np.linalg.norm(v)
+
+
+def neighbour(v: np.ndarray, similarity: float) -> np.ndarray:
+    # a unit vector at exactly `similarity` cosine to `v`
+    other = unit(99, len(v))
+    other -= other.dot(v) * v
+    other /= np.linalg.norm(other)
+    return similarity * v + np.sqrt(1 - similarity ** 2) * other
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(root=str(tmp_path), threshold=0.95)
+
+
+@pytest.mark.parametrize("stored, asked", NEAR_MISSES)
+def test_near_misses_do_not_collide(cache, stored, asked):
+    # the embedding model scores them above the threshold; the names differ
+    v = unit(1)
+    cache.put(stored, v.tolist(), "answer")
+    assert cache.lookup(neighbour(v, 0.98).tolist(), asked, entity_terms(CONTEXT)) is None
+
+
+@pytest.mark.parametrize("stored, asked", PARAPHRASES)
+def test_paraphrases_hit(cache, stored, asked):
+    v = unit(2)
+    cache.put(stored, v.tolist(), "answer")
+    hit = cache.lookup(neighbour(v, 0.98).tolist(), asked, entity_terms(CONTEXT))
+    assert hit is not None and hit["query"] == stored
+
+
+def test_below_threshold_misses(cache):
+    v = unit(3)
+    cache.put("What is the fee for BSCS?", v.tolist(), "answer")
+    assert cache.lookup(neighbour(v, 0.9).tolist(), "How much are the BSCS fees?") is None
+
+
+def test_names_from_context_are_distinguishing():
+    entities = entity_terms(CONTEXT)
+    assert not same_subject("fee for computer science", "fee for electrical engineering", entities)
+    assert not same_subject("fee for bscs", "fee for bsee", entities)  # initials of the names, typed lowercase
+    assert same_subject("fee for computer science", "computer science fees", entities)
+
+
+def test_only_names_are_entities():
+    # headings and menus are capitalized too; their words stay ordinary
+    entities = entity_terms("# Fee Structure\nContact Us | Campus Director | Admissions\n" + CONTEXT)
+    assert {"fee", "structure", "contact", "campu", "director", "admission"}.isdisjoint(entities)
+    assert {"computer", "science", "cs", "bscs", "electrical", "bsee", "peef", "beef"} <= entities
+
+
+@pytest.mark.parametrize("answer", [
+    "I don't know the answer to that.",
+    "I do not have information about the EE department head.",
+    "The fee for that program is not mentioned in the context.",
+])
+def test_unknown_answers_are_not_cached(cache, answer):
+    v = unit(4)
+    assert not cache.put("What is the fee for BS Physics?", v.tolist(), answer)
+    assert cache.lookup_exact("What is the fee for BS Physics?") is None
+    assert cache.lookup(v.tolist(), "What is the fee for BS Physics?") is None
+
+
+# ——— With the deployed embedding model (skipped where it is not installed) ———
+
+
+@pytest.fixture(scope="module")
+def embed():
+    pytest.importorskip("sentence_transformers")
+    langchain_huggingface = pytest.importorskip("langchain_huggingface")
+    from model_registry import EMBEDDING_MODEL
+
+    try:
+        model = langchain_huggingface.HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL, encode_kwargs={"normalize_embeddings": True}
+        )
+    except Exception as e:  # weights not downloadable here
+        pytest.skip(f"{EMBEDDING_MODEL} unavailable: {e}")
+    return model.embed_documents
+
+
+def test_threshold_is_calibrated(embed):
+    # the default must sit above every pair that same_subject() lets through
+    result = calibrate(embed, entity_terms(CONTEXT))
+    assert SEMANTIC_CACHE_THRESHOLD >= result["suggested_threshold"], result
+
+
+@pytest.mark.parametrize("stored, asked, same", CALIBRATION_PAIRS)
+def test_calibration_pairs(tmp_path, embed, stored, asked, same):
+    cache = SemanticCache(root=str(tmp_path))
+    stored_vec, asked_vec = embed([stored, asked])
+    cache.put(stored, stored_vec, "answer")
+    hit = cache.lookup(asked_vec, asked, entity_terms(CONTEXT))
+    assert (hit is not None) == same
@@ -0,0 +1,60 @@
+# transcript_cache.py
+
+import os
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from cache_store import MongoCache, content_hash
+
+# Transcripts are kept this long after their last use
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", str(90 * 24 * 3600)))
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "5000"))
+
+transcript_cache = MongoCache("transcripts", ttl_seconds=TRANSCRIPT_CACHE_TTL, max_entries=TRANSCRIPT_CACHE_SIZE)
+
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Query parameters that do not change which media a URL points to
+_TRACKING_PARAMS = {"si", "feature", "t", "start", "pp", "ab_channel", "fbclid", "gclid"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a media URL: YouTube links in any of their shapes
+    (watch, youtu.be, shorts, embed, mobile) map to "youtube:<id>"; other
+    URLs lose tracking parameters, fragments and case in the host.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().split(":")[0]
+    if host.startswith(("www.", "m.", "music.")):
+        host = host.split(".", 1)[1]
+    query = dict(parse_qsl(parts.query))
+    video_id = None
+    if host == "youtu.be":
+        video_id = parts.path.strip("/").split("/")[0]
+    elif host == "youtube.com":
+        segments = parts.path.strip("/").split("/")
+        if segments[0] == "watch":
+            video_id = query.get("v")
+        elif segments[0] in ("shorts", "embed", "live", "v") and len(segments) > 1:
+            video_id = segments[1]
+    if video_id and _YOUTUBE_ID.match(video_id):
+        return f"youtube:{video_id}"
+    kept = sorted((k, v) for k, v in query.items() if k not in _TRACKING_PARAMS and not k.startswith("utm_"))
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{urlencode(kept)}" if kept else "")
+
+
+def transcript_key(model: str, prompt: str, source: str) -> str:
+    # source is a normalized URL or "sha256:<content hash>"
+    return f"{model}:{content_hash(prompt.encode())[:16]}:{source}"
+
+
+def get(key: str):
+    return transcript_cache.get(key)
+
+
+def put(key: str, value):
+    transcript_cache.set(key, value)
+
+
+def stats() -> dict:
+    return transcript_cache.stats()
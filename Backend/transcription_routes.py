@@ -1,9 +1,16 @@
 # transcription_routes.py
 
 import os
-from fastapi import APIRouter, File, UploadFile, HTTPException
+import re
+import asyncio
+from typing import List
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
 from fastapi.responses import JSONResponse
-from groq import Groq
+import audio_utils
+import model_registry
+import transcript_cache
+from cache_store import file_hash
+from uploads import MAX_AUDIO_BYTES, max_body, spooled
 
 router = APIRouter(prefix="/transcribe", tags=["transcription"])
 
@@ -12,14 +19,123 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable is not set")
 
-client = Groq(api_key=GROQ_API_KEY)
+aclient = model_registry.async_groq_client(GROQ_API_KEY)
+
+WHISPER_MODEL = "whisper-large-v3"
+# Segments of one long recording transcribed at the same time
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+# Uploads larger than this (the API caps files at 25 MB) are always split
+LONG_AUDIO_BYTES = int(os.getenv("LONG_AUDIO_BYTES", str(20 * 1024 * 1024)))
+# Words compared when removing text repeated across a segment boundary
+OVERLAP_MAX_WORDS = 12
+
+
+def as_dict(resp) -> dict:
+    if isinstance(resp, dict):
+        return resp
+    return resp.model_dump() if hasattr(resp, "model_dump") else vars(resp)
+
+
+def _word(w: str) -> str:
+    return re.sub(r"\W", "", w.lower())
+
+
+def overlap_words(tail: List[str], words: List[str], max_words: int = OVERLAP_MAX_WORDS) -> int:
+    """
+    Length of the longest run that ends `tail` and starts `words`, ignoring
+    case and punctuation, i.e. how many leading words are a repeat.
+    """
+    tail = [_word(w) for w in tail[-max_words:]]
+    head = [_word(w) for w in words[:max_words]]
+    for n in range(min(len(tail), len(head)), 0, -1):
+        if tail[-n:] == head[:n]:
+            return n
+    return 0
+
+
+def stitch(plan: list, parts: list) -> list:
+    """
+    Merges per-segment verbose_json results into one timeline: timestamps are
+    shifted by each segment's start, lines that fall in the overlap before a
+    segment's boundary are dropped (the previous segment has them), and
+    words repeated across the cut are trimmed.
+    """
+    lines = []
+    for (start, boundary, end), part in zip(plan, parts):
+        segments = part.get("segments") or [{"start": boundary - start, "end": end - start, "text": part.get("text", "")}]
+        for seg in segments:
+            seg_start, seg_end = seg["start"] + start, seg["end"] + start
+            if (seg_start + seg_end) / 2 < boundary:
+                continue
+            words = seg["text"].split()
+            if lines:
+                words = words[overlap_words(lines[-1]["text"].split(), words):]
+            if not words:
+                continue
+            lines.append({"id": len(lines), "start": round(seg_start, 3), "end": round(seg_end, 3), "text": " ".join(words)})
+    return lines
+
+
+async def transcribe_chunked(path: str) -> dict:
+    """
+    Splits the recording on silence into overlapping segments and transcribes
+    up to TRANSCRIBE_CONCURRENCY of them at once, so a long lecture takes
+    about as long as its slowest batch of segments.
+    """
+    total = await asyncio.to_thread(audio_utils.duration, path)
+    cuts = await asyncio.to_thread(audio_utils.silences, path)
+    plan = audio_utils.plan_segments(total, cuts)
+    sem = asyncio.Semaphore(TRANSCRIBE_CONCURRENCY)
+
+    async def transcribe(idx, start, end):
+        async with sem:
+            data = await asyncio.to_thread(audio_utils.extract_segment, path, start, end)
+            resp = await aclient.audio.transcriptions.create(
+                file=(f"segment{idx}.flac", data),
+                model=WHISPER_MODEL,
+                response_format="verbose_json",
+            )
+        return as_dict(resp)
+
+    tasks = [asyncio.create_task(transcribe(idx, start, end)) for idx, (start, _, end) in enumerate(plan)]
+    try:
+        parts = await asyncio.gather(*tasks)
+    except Exception:
+        for t in tasks:
+            t.cancel()
+        raise
+    lines = stitch(plan, parts)
+    return {
+        "transcript": " ".join(line["text"] for line in lines),
+        "segments": lines,
+        "duration": total,
+        "chunks": len(plan),
+    }
+
+
+def is_long(path: str, size: int) -> bool:
+    if size > LONG_AUDIO_BYTES:
+        return True
+    try:
+        return audio_utils.duration(path) > audio_utils.AUDIO_SEGMENT_SECONDS * (1 + audio_utils.SNAP_WINDOW)
+    except Exception:
+        # no ffprobe or unreadable header; small files go up in one piece
+        return False
+
 
 @router.post(
     "/audio",
     summary="Upload an audio file and return its transcription",
     response_description="Returns transcribed text as JSON"
 )
-async def transcribe_audio(file: UploadFile = File(...)):
+@max_body(MAX_AUDIO_BYTES)
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    mode: str = Query(
+        "auto", pattern="^(auto|single|chunked)$",
+        description="chunked splits long recordings on silence; auto picks it for long or large files",
+    ),
+):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
@@ -31,19 +147,40 @@ async def transcribe_audio(file: UploadFile = File(...)):
             detail=f"Unsupported file type. Allowed: {', '.join(allowed_exts)}"
         )
 
-    data = await file.read()
-    try:
-        resp = client.audio.transcriptions.create(
-            file=(file.filename, data),
-            model="whisper-large-v3",
-            response_format="verbose_json",
-        )
-        # The client returns .text or, if dict-like, resp.get("text")
-        transcript = getattr(resp, "text", None) or resp.get("text")
-        if transcript is None:
-            raise ValueError("No transcript returned by service")
-    except Exception as e:
-        # All errors return 502 with the exception message
-        raise HTTPException(status_code=502, detail=f"Transcription service error: {e}")
-
-    return JSONResponse(content={"transcript": transcript})
+    async with spooled(file, MAX_AUDIO_BYTES) as path:
+        try:
+            if mode == "auto":
+                mode = "chunked" if await asyncio.to_thread(is_long, path, os.path.getsize(path)) else "single"
+            # same recording, model and mode -> same transcript
+            key = transcript_cache.transcript_key(
+                WHISPER_MODEL, mode, "sha256:" + await asyncio.to_thread(file_hash, path)
+            )
+            content = await asyncio.to_thread(transcript_cache.get, key)
+            if content is not None:
+                return JSONResponse(content={**content, "cached": True})
+
+            if mode == "chunked":
+                content = await transcribe_chunked(path)
+            else:
+                with open(path, "rb") as f:
+                    resp = await aclient.audio.transcriptions.create(
+                        file=(file.filename, f),
+                        model=WHISPER_MODEL,
+                        response_format="verbose_json",
+                    )
+                # The client returns .text or, if dict-like, resp.get("text")
+                transcript = getattr(resp, "text", None) or resp.get("text")
+                if transcript is None:
+                    raise ValueError("No transcript returned by service")
+                content = {"transcript": transcript}
+            await asyncio.to_thread(transcript_cache.put, key, content)
+        except Exception as e:
+            # All errors return 502 with the exception message
+            raise HTTPException(status_code=502, detail=f"Transcription service error: {e}")
+
+    return JSONResponse(content={**content, "cached": False})
+
+
+@router.get("/cache/stats", summary="Transcript cache hit ratio and size")
+async def transcript_cache_stats():
+    return JSONResponse(content=transcript_cache.stats())
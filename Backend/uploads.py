@@ -0,0 +1,203 @@
+# uploads.py
+
+import os
+import mmap
+import shutil
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+MB = 1024 * 1024
+
+# Per-file size caps; routes declare their body cap with max_body()
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(MB)))
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(200 * MB)))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(25 * MB)))
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(500 * MB)))
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_BYTES", str(2048 * MB)))
+MAX_DOCUMENT_BYTES = int(os.getenv("MAX_DOCUMENT_BYTES", str(50 * MB)))
+MAX_AVATAR_BYTES = int(os.getenv("MAX_AVATAR_BYTES", str(5 * MB)))
+# Body cap for routes that do not declare one with max_body()
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(16 * MB)))
+# Room for multipart boundaries, headers and form fields next to the files
+FORM_OVERHEAD_BYTES = MB
+
+# Uploads are already on disk in Starlette's spool file; instead of copying
+# them again, spool() keeps that file open and hands out a path to it
+PROC_FD_DIR = f"/proc/{os.getpid()}/fd"
+_held: Dict[str, int] = {}  # path -> duplicated descriptor of the upload
+
+
+def too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large. Limit is {limit / MB:g} MB.")
+
+
+def _copy(src, dst_path: str, limit: int):
+    src.seek(0)
+    written = 0
+    with open(dst_path, "wb") as dst:
+        while True:
+            chunk = src.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > limit:
+                raise too_large(limit)
+            dst.write(chunk)
+
+
+def _hold(file: UploadFile, limit: int, suffix: str) -> str:
+    # fileno() moves a small in-memory upload to disk; the duplicate keeps
+    # the (unnamed) file alive after Starlette closes the upload
+    fd = os.dup(file.file.fileno())
+    try:
+        if os.fstat(fd).st_size > limit:
+            raise too_large(limit)
+        # a symlink to the descriptor gives tools that want a path (poppler,
+        # ffmpeg, loaders that go by extension) a named file without a copy
+        path = os.path.join(tempfile.mkdtemp(prefix="upload-"), "upload" + suffix)
+        os.symlink(os.path.join(PROC_FD_DIR, str(fd)), path)
+    except BaseException:
+        os.close(fd)
+        raise
+    _held[path] = fd
+    return path
+
+
+async def spool(file: UploadFile, limit: int) -> str:
+    """
+    Returns a path to the upload (same extension) that stays valid until the
+    caller passes it to discard(), even past the end of the request. Uploads
+    over `limit` bytes raise 413. Where /proc is available the path points at
+    the file Starlette already wrote; elsewhere the upload is copied once.
+    """
+    if file.size is not None and file.size > limit:
+        raise too_large(limit)
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if os.path.isdir(PROC_FD_DIR):
+        return await asyncio.to_thread(_hold, file, limit, suffix)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_copy, file.file, path, limit)
+    except BaseException:
+        discard(path)
+        raise
+    return path
+
+
+def discard(path: str):
+    fd = _held.pop(path, None)
+    if fd is not None:
+        os.close(fd)
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@asynccontextmanager
+async def spooled(file: UploadFile, limit: int) -> AsyncIterator[str]:
+    path = await spool(file, limit)
+    try:
+        yield path
+    finally:
+        discard(path)
+
+
+@contextmanager
+def mapped(path: str) -> Iterator[memoryview]:
+    """
+    Read-only memory map of a spooled file, for APIs that want a buffer;
+    pages are loaded lazily by the OS instead of copied into the heap.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+# ——— Request body caps ———————————————————————————————————————
+
+def max_body(*file_limits: int) -> Callable:
+    """
+    Endpoint decorator (below the route decorator): caps the request body at
+    the sum of the per-file limits of the files it accepts, plus form overhead.
+    """
+    def decorate(endpoint):
+        endpoint.max_body_bytes = sum(file_limits) + FORM_OVERHEAD_BYTES
+        return endpoint
+    return decorate
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+def _route_limit(scope) -> int:
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "max_body_bytes", MAX_REQUEST_BYTES)
+    return MAX_REQUEST_BYTES
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware enforcing each route's max_body() cap (MAX_REQUEST_BYTES
+    otherwise) while the body streams in: a declared Content-Length over the
+    cap is refused before reading, and a chunked body is cut off with 413 as
+    soon as it passes the cap, instead of after Starlette has stored it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = _route_limit(scope)
+        response = JSONResponse(status_code=413, content={"detail": too_large(limit).detail})
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await response(scope, receive, send)
+
+        received = 0
+        exceeded = started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return  # the 413 below replaces whatever error the app reports
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await response(scope, receive, send)
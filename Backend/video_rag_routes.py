@@ -1,46 +1,66 @@
 # video_rag_routes.py
 
 import os
-import uuid
+import json
+import time
+import asyncio
+import faiss
+import numpy as np
+from typing import Optional
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
-from google import genai
 from google.genai import types
 
+from rate_limiter import gemini_generate_stream
+import model_registry
+from uploads import MAX_VIDEO_BYTES, discard, max_body, spool
+from session_store import SessionStore
+from cache_store import file_hash
+import transcript_cache
+import job_owner
+
 router = APIRouter()
 
+VIDEO_MODEL = "models/gemini-2.0-flash"
+# Videos transcribed and indexed at once per worker; the rest wait queued
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+# Streamed transcript buffered before its complete chunks are indexed
+INGEST_FLUSH_CHARS = int(os.getenv("INGEST_FLUSH_CHARS", "4096"))
+
 # ——— Helpers ——————————————————————————————————————————————
 
 def init_google_client():
     api_key = os.getenv("GOOGLE_API_KEY", "")
     if not api_key:
         raise ValueError("GOOGLE_API_KEY must be set")
-    return genai.Client(api_key=api_key)
+    return model_registry.genai_client(api_key)
 
 def get_llm():
     api_key = os.getenv("CHATGROQ_API_KEY", "")
     if not api_key:
         raise ValueError("CHATGROQ_API_KEY must be set")
-    return ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0,
-        max_tokens=1024,
-        api_key=api_key,
-    )
+    return model_registry.chat_groq(api_key)
+
+async def upload_to_gemini(client, path: str, mime_type: str):
+    """
+    Streams a local file to the Gemini Files API and waits until it is
+    ready to be referenced in a prompt (videos are processed server-side).
+    """
+    uploaded = await client.aio.files.upload(file=path, config=types.UploadFileConfig(mime_type=mime_type))
+    while uploaded.state == types.FileState.PROCESSING:
+        await asyncio.sleep(2)
+        uploaded = await client.aio.files.get(name=uploaded.name)
+    if uploaded.state == types.FileState.FAILED:
+        raise ValueError(f"Gemini could not process {uploaded.name}")
+    return uploaded
 
 def get_embeddings():
-    return HuggingFaceEmbeddings(
-        model_name="BAAI/bge-small-en",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True},
-    )
+    return model_registry.embeddings()
 
 # Simple prompt template for RAG
 quiz_prompt = """
@@ -69,61 +89,188 @@ def create_chain(retriever):
         verbose=False,
     )
 
-# In-memory session store
-sessions: dict[str, dict] = {}
+# Disk-backed session store shared by all workers
+sessions = SessionStore()
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=20)
+
+class IncrementalIndex:
+    """
+    Builds a session's index while its transcript is still arriving: text
+    is buffered, and every INGEST_FLUSH_CHARS the complete chunks in the
+    buffer are embedded, added and saved, so they are queryable right away.
+    The last chunk is held back since more text may still extend it.
+    """
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.index = None
+        self.chunks = []
+        self.text = ""
+        self.buffer = ""
+
+    async def add(self, text: str):
+        self.text += text
+        self.buffer += text
+        if len(self.buffer) >= INGEST_FLUSH_CHARS:
+            await self.flush(final=False)
+
+    async def flush(self, final: bool = True):
+        pieces = splitter.split_text(self.buffer)
+        if final:
+            self.buffer = ""
+        elif len(pieces) > 1:
+            # carry the raw tail (whitespace included) into the next flush
+            self.buffer = self.buffer[self.buffer.rfind(pieces[-1]):]
+            pieces = pieces[:-1]
+        else:
+            return
+        if not pieces:
+            return
+        vectors = np.asarray(await get_embeddings().aembed_documents(pieces), dtype="float32")
+        if self.index is None:
+            self.index = faiss.IndexFlatL2(vectors.shape[1])  # as FAISS.from_texts builds it
+        self.index.add(vectors)
+        self.chunks.extend(pieces)
+        await asyncio.to_thread(sessions.save, self.sid, self.index, self.chunks)
+        await asyncio.to_thread(
+            sessions.set_status, self.sid, chunks=len(self.chunks), chars=len(self.text), queryable=True
+        )
+
+# ——— Ingestion jobs ——————————————————————————————————————
+
+_ingest_slots = None  # created on first use so it binds to the server's event loop
+_ingest_tasks = {}  # session_id -> task; keeps running jobs referenced until they finish
+
+async def run_ingestion(sid: str, prompt: str, url: Optional[str] = None,
+                        path: Optional[str] = None, mime_type: Optional[str] = None):
+    """
+    Transcribes a video (a URL, or an uploaded file at `path` that the job
+    owns and removes) and indexes the transcript into session `sid` as it
+    streams in. A transcript seen before skips Gemini; the session still
+    gets its own history.
+    """
+    global _ingest_slots
+    if _ingest_slots is None:
+        _ingest_slots = asyncio.Semaphore(INGEST_CONCURRENCY)
+    client = uploaded = None
+    try:
+        async with _ingest_slots:
+            await asyncio.to_thread(sessions.set_status, sid, status="running", started_at=time.time())
+            if path:
+                source = "sha256:" + await asyncio.to_thread(file_hash, path)
+            else:
+                source = transcript_cache.normalize_url(url)
+            key = transcript_cache.transcript_key(VIDEO_MODEL, prompt, source)
+            index = IncrementalIndex(sid)
+            txt = await asyncio.to_thread(transcript_cache.get, key)
+            cached = txt is not None
+            if cached:
+                await index.add(txt)
+            else:
+                client = init_google_client()
+                if path:
+                    uploaded = await upload_to_gemini(client, path, mime_type)
+                    file_data = types.FileData(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+                else:
+                    file_data = types.FileData(file_uri=url)
+                async for chunk in gemini_generate_stream(
+                    client,
+                    model=VIDEO_MODEL,
+                    contents=types.Content(parts=[types.Part(text=prompt), types.Part(file_data=file_data)]),
+                ):
+                    if chunk.text:
+                        await index.add(chunk.text)
+            await index.flush()
+            if not index.chunks:
+                raise ValueError("Gemini returned an empty transcript")
+            if not cached:
+                await asyncio.to_thread(transcript_cache.put, key, index.text)
+            await asyncio.to_thread(
+                sessions.set_status, sid, status="completed", cached=cached, finished_at=time.time()
+            )
+    except asyncio.CancelledError:
+        # shutdown or restart: without this the session would look indexing forever
+        await asyncio.to_thread(
+            sessions.set_status, sid, status="failed", error="Interrupted by a server shutdown", finished_at=time.time()
+        )
+        raise
+    except Exception as e:
+        await asyncio.to_thread(sessions.set_status, sid, status="failed", error=str(e), finished_at=time.time())
+    finally:
+        if path:
+            discard(path)
+        if uploaded is not None:
+            try:
+                await client.aio.files.delete(name=uploaded.name)
+            except Exception:
+                pass  # Gemini drops uploaded files after 48h anyway
+
+async def start_ingestion(**job) -> dict:
+    sid = await asyncio.to_thread(
+        sessions.reserve, status="queued", created_at=time.time(), owner=job_owner.current()
+    )
+    task = asyncio.create_task(run_ingestion(sid, **job))
+    _ingest_tasks[sid] = task
+    task.add_done_callback(lambda _: _ingest_tasks.pop(sid, None))
+    return {"session_id": sid, "status": "queued"}
+
+def session_status_or_none(session_id: str) -> Optional[dict]:
+    """
+    The session's status; a queued/running one whose job died with its
+    process (see job_owner) is marked failed first.
+    """
+    status = sessions.status(session_id)
+    if status and status.get("status") in ("queued", "running"):
+        idle = time.time() - status.get("updated_at", status.get("created_at", 0))
+        if job_owner.orphaned(status.get("owner"), idle, live=session_id in _ingest_tasks):
+            sessions.set_status(
+                session_id, status="failed", error="Interrupted by a server restart", finished_at=time.time()
+            )
+            status = sessions.status(session_id)
+    return status
 
-def process_transcription(text: str) -> str:
-    # split → embed → index → store retriever & empty history
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=20)
-    chunks = splitter.split_text(text)
-    vs = FAISS.from_texts(chunks, get_embeddings())
-    retr = vs.as_retriever(search_kwargs={"k": 3})
-    sid = str(uuid.uuid4())
-    sessions[sid] = {"retriever": retr, "history": []}
-    return sid
+async def load_session(session_id: str):
+    vs = await asyncio.to_thread(sessions.load, session_id, get_embeddings())
+    if vs is None:
+        status = await asyncio.to_thread(session_status_or_none, session_id)
+        if status and status.get("status") in ("queued", "running"):
+            raise HTTPException(status_code=409, detail="Session is still being indexed; try again shortly")
+        raise HTTPException(status_code=404, detail="Session not found")
+    return vs
 
 # ——— Endpoints ———————————————————————————————————————————
 
 class URLIn(BaseModel):
     youtube_url: str
 
-@router.post("/transcribe_video")
+@router.post("/transcribe_video", status_code=202)
 async def transcribe_url(body: URLIn):
-    client = init_google_client()
-    try:
-        resp = client.models.generate_content(
-            model="models/gemini-2.0-flash",
-            contents=types.Content(parts=[
-                types.Part(text="Transcribe the video"),
-                types.Part(file_data=types.FileData(file_uri=body.youtube_url))
-            ])
-        )
-        txt = resp.candidates[0].content.parts[0].text
-        sid = process_transcription(txt)
-        return {"session_id": sid}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """
+    Queues transcription and indexing; poll /vid_sessions/{session_id}/status.
+    The session can be queried as soon as its first chunks are indexed.
+    """
+    return await start_ingestion(prompt="Transcribe the video", url=body.youtube_url)
 
-@router.post("/upload_video")
+@router.post("/upload_video", status_code=202)
+@max_body(MAX_VIDEO_BYTES)
 async def upload_file(
     file: UploadFile = File(...),
     prompt: str = "Transcribe the video",
 ):
-    data = await file.read()
-    client = init_google_client()
+    path = await spool(file, MAX_VIDEO_BYTES)
     try:
-        resp = client.models.generate_content(
-            model="models/gemini-2.0-flash",
-            contents=types.Content(parts=[
-                types.Part(text=prompt),
-                types.Part(inline_data=types.Blob(data=data, mime_type=file.content_type))
-            ])
-        )
-        txt = resp.candidates[0].content.parts[0].text
-        sid = process_transcription(txt)
-        return {"session_id": sid}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return await start_ingestion(prompt=prompt, path=path, mime_type=file.content_type)
+    except BaseException:
+        discard(path)
+        raise
+
+@router.get("/vid_sessions/{session_id}/status")
+async def session_status(session_id: str):
+    status = await asyncio.to_thread(session_status_or_none, session_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, **status}
 
 class QueryIn(BaseModel):
     session_id: str
@@ -131,18 +278,68 @@ class QueryIn(BaseModel):
 
 @router.post("/vid_query")
 async def query_rag(body: QueryIn):
-    sess = sessions.get(body.session_id)
-    if not sess:
-        raise HTTPException(status_code=404, detail="Session not found")
-    chain = create_chain(sess["retriever"])
-    result = chain.invoke({
+    vs = await load_session(body.session_id)
+    history = await asyncio.to_thread(sessions.history, body.session_id)
+    chain = create_chain(vs.as_retriever(search_kwargs={"k": 3}))
+    result = await chain.ainvoke({
         "question": body.query,
-        "chat_history": sess["history"]
+        "chat_history": history
     })
     answer = result.get("answer", "I don't know.")
     # update history
-    sess["history"].append((body.query, answer))
+    await asyncio.to_thread(sessions.append_history, body.session_id, body.query, answer)
     # collect source snippets
     docs = result.get("source_documents") or []
     srcs = [getattr(d, "page_content", str(d)) for d in docs]
     return {"answer": answer, "source_documents": srcs}
+
+def format_history(history: list) -> str:
+    # (question, answer) turns in the layout the condense prompt expects
+    return "".join(f"\nHuman: {q}\nAssistant: {a}" for q, a in history)
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/vid_query/stream")
+async def query_rag_stream(body: QueryIn):
+    """
+    Same answer as /vid_query as server-sent events: "sources" (the
+    retrieved snippets) first, then one "token" event per streamed chunk,
+    then "done" with the full answer once it is saved to the history.
+    """
+    vs = await load_session(body.session_id)
+    history = await asyncio.to_thread(sessions.history, body.session_id)
+    llm = get_llm()
+
+    async def stream():
+        try:
+            # follow-ups are rephrased into a standalone question, as the chain does
+            question = body.query
+            if history:
+                condensed = await llm.ainvoke(CONDENSE_QUESTION_PROMPT.format(
+                    chat_history=format_history(history), question=body.query
+                ))
+                question = condensed.content
+            docs = await vs.as_retriever(search_kwargs={"k": 3}).ainvoke(question)
+            yield sse("sources", {"source_documents": [d.page_content for d in docs]})
+
+            messages = chat_prompt.format_messages(
+                context="\n\n".join(d.page_content for d in docs), question=question
+            )
+            answer = ""
+            async for chunk in llm.astream(messages):
+                if chunk.content:
+                    answer += chunk.content
+                    yield sse("token", {"text": chunk.content})
+        except Exception as e:
+            yield sse("error", {"detail": str(e)})
+            return
+        answer = answer or "I don't know."
+        await asyncio.to_thread(sessions.append_history, body.session_id, body.query, answer)
+        yield sse("done", {"answer": answer})
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@router.get("/vid_sessions/stats")
+async def session_stats():
+    return sessions.stats()
@@ -1,4 +1,4 @@
-import React, { useState, useRef } from "react";
+import React, { useState, useRef, useEffect } from "react";
 import { FiSend, FiPaperclip } from "react-icons/fi";
 import axios from "axios";
 import Cookies from "js-cookie";
@@ -6,12 +6,16 @@ import ReactMarkdown from "react-markdown";
 
 const backendBaseUrl = "https://mominah-edulearnai.hf.space";
 const token = Cookies.get("access_token");
+// How often to check whether a queued session can take questions yet
+const STATUS_POLL_MS = 2000;
 
 export default function VideoRagPage() {
   // URL input for transcription
   const [youtubeUrl, setYoutubeUrl] = useState("");
   // RAG session ID
   const [sessionId, setSessionId] = useState(null);
+  // True once the session has indexed enough of the transcript to answer
+  const [sessionReady, setSessionReady] = useState(false);
   // Chat messages
   const [messages, setMessages] = useState([]);
   // Loading states
@@ -25,11 +29,80 @@ export default function VideoRagPage() {
   const fileInputRef = useRef();      // for video-file upload
   const ocrFileInputRef = useRef();   // for OCR‐upload
   const inputFieldRef = useRef();     // for focusing the chat input
+  const pollRef = useRef(null);       // pending status check of the session
+  const pollingIdRef = useRef(null);  // session being polled; stale replies are ignored
+
+  const stopPolling = () => {
+    clearTimeout(pollRef.current);
+    pollRef.current = null;
+    pollingIdRef.current = null;
+  };
+
+  useEffect(() => stopPolling, []);
+
+  // — Transcription runs in the background: wait until the session is queryable —
+  const waitForSession = (id, startedText) => {
+    stopPolling();
+    pollingIdRef.current = id;
+    setSessionId(id);
+    setSessionReady(false);
+    setMessages([
+      { id: 0, sender: "system", text: `${startedText} (ID: ${id}). Transcribing…` },
+    ]);
+
+    const check = async () => {
+      try {
+        const { data } = await axios.get(
+          `${backendBaseUrl}/vid_sessions/${id}/status`,
+          { headers: { Authorization: `Bearer ${token}` } }
+        );
+        if (pollingIdRef.current !== id) return;
+        const done = data.status === "completed" || data.status === "failed";
+        if (data.queryable) {
+          // answers come from what is indexed so far while the rest streams in
+          setSessionReady(true);
+          setMessages((prev) => [
+            {
+              id: 0,
+              sender: "system",
+              text:
+                data.status === "failed"
+                  ? `${startedText} (ID: ${id}). ⚠️ Indexing stopped early (${data.error || "unknown error"}); answers cover only part of the video.`
+                  : data.status === "completed"
+                  ? `${startedText} (ID: ${id}). Ask your first question below.`
+                  : `${startedText} (ID: ${id}). Ask your first question below; the rest of the video is still being indexed.`,
+            },
+            ...prev.slice(1),
+          ]);
+        } else if (data.status === "failed") {
+          setMessages([
+            { id: 0, sender: "system", text: `⚠️ Transcription failed: ${data.error || "unknown error"}` },
+          ]);
+        }
+        if (done) {
+          stopPolling();
+          return;
+        }
+      } catch (err) {
+        console.error("Status error:", err.response?.data ?? err);
+        if (pollingIdRef.current !== id) return;
+        if (err.response?.status === 404) {
+          stopPolling();
+          setMessages([{ id: 0, sender: "system", text: "⚠️ Session not found; please start again." }]);
+          return;
+        }
+      }
+      pollRef.current = setTimeout(check, STATUS_POLL_MS);
+    };
+    pollRef.current = setTimeout(check, 0);
+  };
 
   // — Reset everything to start a new chat —
   const handleReset = () => {
+    stopPolling();
     setYoutubeUrl("");
     setSessionId(null);
+    setSessionReady(false);
     setMessages([]);
     setInputValue("");
     setLoading(false);
@@ -52,14 +125,7 @@ export default function VideoRagPage() {
           },
         }
       );
-      setSessionId(data.session_id);
-      setMessages([
-        {
-          id: 0,
-          sender: "system",
-          text: `🎬 Session started (ID: ${data.session_id}). Ask your first question below.`,
-        },
-      ]);
+      waitForSession(data.session_id, "🎬 Session started");
       setYoutubeUrl("");
     } catch (err) {
       console.error("URL submit error:", err.response?.data ?? err);
@@ -89,14 +155,7 @@ export default function VideoRagPage() {
           },
         }
       );
-      setSessionId(data.session_id);
-      setMessages([
-        {
-          id: 0,
-          sender: "system",
-          text: `📤 Session started (ID: ${data.session_id}). Ask your first question below.`,
-        },
-      ]);
+      waitForSession(data.session_id, "📤 Session started");
     } catch (err) {
       console.error("Upload error:", err.response?.data ?? err);
       alert(
@@ -148,7 +207,7 @@ export default function VideoRagPage() {
   // — 4) Send a user query & stream the RAG response —
   const handleSend = async () => {
     const question = inputValue.trim();
-    if (!question || !sessionId) return;
+    if (!question || !sessionId || !sessionReady) return;
 
     // add user message
     setMessages((prev) => [
@@ -186,7 +245,13 @@ export default function VideoRagPage() {
       setMessages((prev) =>
         prev.map((m) =>
           m.id === sysId
-            ? { ...m, text: "⚠️ Failed to fetch answer." }
+            ? {
+                ...m,
+                text:
+                  err.response?.status === 409
+                    ? "⏳ The video is still being indexed; try again shortly."
+                    : "⚠️ Failed to fetch answer.",
+              }
             : m
         )
       );
@@ -293,17 +358,19 @@ export default function VideoRagPage() {
             value={inputValue}
             onChange={(e) => setInputValue(e.target.value)}
             onKeyDown={(e) => e.key === "Enter" && handleSend()}
-            disabled={!sessionId}
+            disabled={!sessionReady}
             className="flex-1 border border-gray-300 rounded px-2 py-1 text-sm"
             placeholder={
-              sessionId
+              sessionReady
                 ? "Ask a question about the video"
+                : sessionId
+                ? "Transcribing the video…"
                 : "Transcribe a video first"
             }
           />
           <button
             onClick={handleSend}
-            disabled={!sessionId || !inputValue.trim()}
+            disabled={!sessionReady || !inputValue.trim()}
             className="p-1 hover:bg-gray-200 rounded disabled:opacity-50 disabled:cursor-not-allowed"
           >
             <FiSend size={20} />